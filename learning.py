@@ -1,9 +1,24 @@
 import sys
 import random
 import bisect
+import array
+import heapq
+import time
 import itertools
 import collections
+import collections.abc
+import concurrent.futures
+import tracemalloc
+import argparse
+import json
+import mmap
+import struct
 import numpy as np
+from unittest import mock
+import unittest
+import io
+import os
+import tempfile
 
 
 class MDP:
@@ -94,6 +109,18 @@ class SheriffChase1D(MDP):
         target_probability = 1.0
         return [(target_state, target_probability)]
 
+    def relocate(self, criminal: int = None, prison: int = None) -> set:
+        """ Move the criminal and/or the prison and return the states whose reward or transitions changed, which are
+        only the old and new terminals. """
+        criminal = self.criminal if criminal is None else criminal
+        prison = self.prison if prison is None else prison
+        if criminal == prison or criminal not in self.states or prison not in self.states:
+            raise ValueError
+        changed = set(self.terminals)
+        self.criminal, self.prison = criminal, prison
+        self.terminals = {criminal, prison}
+        return changed | self.terminals
+
     def reset(self):
         """ Reset sheriff into a random initial location that isn't prison or criminal. """
         self.state = random.choice(self.states)
@@ -111,6 +138,349 @@ class SheriffChase1D(MDP):
         return {-1: "<", +1: ">"}
 
 
+class GridWorld(MDP):
+    """ Square gridworld where the agent walks towards the goal ◯ in the bottom right corner and avoids pits ✖.
+    Moves slip with the given probability to one of the two perpendicular directions and moves into the border stay
+    put. States are numbered row * size + column, which keeps worlds with a million states compact. """
+    def __init__(self, size: int, slip: float = 0.1, pits: float = 0.05, seed: int = None):
+        """ Construct the gridworld with a random pattern of pits covering the given fraction of tiles. """
+        states = list(range(size * size))
+        actions = [(-1, 0), (+1, 0), (0, -1), (0, +1)]
+        self.size, self.slip = size, slip
+        self.goal = states[-1]
+        self.pits = set(random.Random(seed).sample(states[1:-1], int(pits * (len(states) - 2))))
+        super().__init__(states[0], states, actions, {self.goal} | self.pits, gamma=0.95)
+
+    def move(self, state: int, direction: tuple) -> int:
+        """ Tile reached by moving from the state in the direction, the state itself at the border. """
+        row, column = divmod(state, self.size)
+        row, column = row + direction[0], column + direction[1]
+        if 0 <= row < self.size and 0 <= column < self.size:
+            return row * self.size + column
+        return state
+
+    def transitions(self, state: object, action: object) -> list:
+        """ Move in the intended direction with probability 1 - slip, otherwise slip to either side. """
+        if self.finished(state):
+            return []
+        sideways = [(action[1], action[0]), (-action[1], -action[0])]
+        return [(self.move(state, action), 1.0 - self.slip)] + \
+               [(self.move(state, direction), self.slip / 2) for direction in sideways]
+
+    def reward(self, state: object = None) -> float:
+        """ Return +1 for the goal, -1 for a pit and a small step cost otherwise. """
+        if state is None:
+            state = self.state
+        if state == self.goal:
+            return +1.0
+        if state in self.pits:
+            return -1.0
+        return -0.01
+
+    def reset(self):
+        """ Reset the agent into the top left corner. """
+        self.state = self.states[0]
+
+
+class RandomMDP(MDP):
+    """ Random sparse MDP where every action leads to a fixed number of random successor states with random
+    probabilities and every state has a normally distributed reward. """
+    def __init__(self, states: int, actions: int = 4, successors: int = 3, seed: int = None):
+        """ Construct the MDP drawing successors, probabilities and rewards from a seeded generator. """
+        generator = np.random.default_rng(seed)
+        self.successors = generator.integers(states, size=[states, actions, successors], dtype=np.int32)
+        self.probabilities = generator.dirichlet(np.ones(successors), size=[states, actions])
+        self.rewards = generator.normal(size=states)
+        super().__init__(0, list(range(states)), list(range(actions)), set(), gamma=0.9)
+
+    def transitions(self, state: object, action: object) -> list:
+        return list(zip(self.successors[state, action].tolist(), self.probabilities[state, action].tolist()))
+
+    def reward(self, state: object = None) -> float:
+        if state is None:
+            state = self.state
+        return float(self.rewards[state])
+
+    def reset(self):
+        self.state = self.states[0]
+
+
+class MazeMDP(MDP):
+    """ Maze of `maze.py` as a deterministic MDP: states are cells, actions the four wall bits of a cell and moves into
+    a wall stay put. The finish is the only terminal, so long corridors need a discount rate close to 1. """
+    def __init__(self, size: int, algorithm: str = "dfs", seed: int = None):
+        """ Generate the maze, importing `maze.py` only here as it depends on PyQt5. """
+        from maze import Maze
+        self.maze = Maze(size, algorithm, seed)
+        self.offsets = {Maze.UP: -size, Maze.DOWN: +size, Maze.LEFT: -1, Maze.RIGHT: +1}
+        super().__init__(self.maze.start, list(range(size * size)), list(Maze.DIRECTIONS), {self.maze.finish},
+                         gamma=0.99)
+
+    def transitions(self, state: object, action: object) -> list:
+        if self.finished(state):
+            return []
+        if self.maze.walls[state] & action:
+            return [(state, 1.0)]
+        return [(state + self.offsets[action], 1.0)]
+
+    def reward(self, state: object = None) -> float:
+        if state is None:
+            state = self.state
+        return 1.0 if state == self.maze.finish else -0.01
+
+    def reset(self):
+        self.state = self.maze.start
+
+
+class CachedMDP:
+    """ Opt-in memoizing wrapper around an MDP that records transitions and rewards the first time they are queried.
+    Solvers given the wrapper instead of the MDP share it's entries, which pays off when the transition model is
+    expensive. Nothing is cached unless the caller wraps the MDP, and the caller clears or forgets entries after
+    changing the MDP. If maxsize is given at most that many entries are kept, evicting the least recently used one.
+    Hits and misses are counted and any other attribute is read from the wrapped MDP. """
+    def __init__(self, mdp: MDP, maxsize: int = None):
+        """ Construct an empty cache for the MDP holding all, or up to maxsize, transition lists and rewards. """
+        self.mdp = mdp
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits, self.misses = 0, 0
+
+    def __getattr__(self, name: str) -> object:
+        if name == "mdp":
+            raise AttributeError(name)
+        return getattr(self.mdp, name)
+
+    def query(self, key: tuple, function: object, *args) -> object:
+        """ Return the cached result for the key or compute it with function(*args) and store it. """
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        result = self.entries[key] = function(*args)
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return result
+
+    def transitions(self, state: object, action: object) -> list:
+        """ Cached transition model of the wrapped MDP. """
+        return self.query((state, action), self.mdp.transitions, state, action)
+
+    def reward(self, state: object = None) -> float:
+        """ Cached reward of the wrapped MDP, the reward of the current state is always queried. """
+        if state is None:
+            return self.mdp.reward()
+        return self.query((state,), self.mdp.reward, state)
+
+    def clear(self):
+        """ Forget all entries, needed after the wrapped MDP changes it's transitions or rewards. """
+        self.entries.clear()
+
+    def forget(self, states: set):
+        """ Forget the entries of the given states only, after the wrapped MDP changed just their transitions or
+        rewards. """
+        for key in [key for key in self.entries if key[0] in states]:
+            del self.entries[key]
+
+    def __repr__(self) -> str:
+        return repr(self.mdp)
+
+
+class CompiledMDP:
+    """ MDP compiled into arrays for vectorized solvers. States and actions are replaced by their index in the MDP
+    lists and the reward function becomes a vector, subclasses decide how the transition model is stored. """
+    def __init__(self, mdp: MDP):
+        """ Compile the MDP by querying the reward of every state once. """
+        self.mdp = mdp
+        self.gamma = mdp.gamma
+        self.index = {state: idx for idx, state in enumerate(mdp.states)}
+        self.rewards = np.array([mdp.reward(state) for state in mdp.states], dtype=float)
+
+    def payoffs(self, value: np.ndarray) -> np.ndarray:
+        """ Expected value of the next state for every action and state as an (A, S) array. """
+        raise NotImplementedError
+
+    def policy_payoffs(self, actions: np.ndarray) -> object:
+        """ Return a function mapping a value function to the expected value of the next state when every state
+        takes the action of the given action index array. """
+        raise NotImplementedError
+
+    def backup(self, value: np.ndarray) -> np.ndarray:
+        """ Bellman optimality backup of the value function for all states at once. """
+        return self.rewards + self.gamma * self.payoffs(value).max(axis=0)
+
+    def evaluate(self, actions: np.ndarray, value: np.ndarray = None, tolerance: float = 1e-6,
+                 max_iter: int = 10000) -> np.ndarray:
+        """ Policy evaluation: solve the linear system (I - gamma * P) value = reward, where P holds the transitions
+        of the policy's actions, with the BiCGSTAB Krylov solver started from the given value function. Only needs
+        products with the transitions of the policy, never a (S, S) matrix, and takes far fewer of them than repeating
+        value = reward + gamma * P value when gamma is close to 1. Stops once the residual reward - (I - gamma * P)
+        value, which is the change such a repetition would make, is below tolerance everywhere. """
+        policy_payoffs = self.policy_payoffs(actions)
+        operator = lambda vector: vector - self.gamma * policy_payoffs(vector)
+        value = np.zeros(shape=[len(self.rewards)]) if value is None else np.array(value, dtype=float)
+        residual = self.rewards - operator(value)
+        iterations = 0
+        while np.abs(residual).max() >= tolerance and iterations < max_iter:
+            # (Re)start from the true residual, which also recovers from breakdowns and from round-off drift of the
+            # recursively updated residual.
+            shadow, rho, alpha, omega = residual.copy(), 1.0, 1.0, 1.0
+            direction, product = np.zeros(shape=value.shape), np.zeros(shape=value.shape)
+            while iterations < max_iter:
+                iterations += 1
+                rho, previous_rho = shadow @ residual, rho
+                if rho == 0.0:
+                    break
+                direction = residual + (rho / previous_rho) * (alpha / omega) * (direction - omega * product)
+                product = operator(direction)
+                if shadow @ product == 0.0:
+                    break
+                alpha = rho / (shadow @ product)
+                value += alpha * direction
+                halfway = residual - alpha * product
+                if np.abs(halfway).max() < tolerance:
+                    break
+                corrected = operator(halfway)
+                omega = (corrected @ halfway) / (corrected @ corrected)
+                value += omega * halfway
+                residual = halfway - omega * corrected
+                if omega == 0.0 or np.abs(residual).max() < tolerance:
+                    break
+            residual = self.rewards - operator(value)
+        return value
+
+
+class DenseMDP(CompiledMDP):
+    """ Compiled MDP with the transition model as a dense (A, S, S) tensor of probabilities. """
+    def __init__(self, mdp: MDP):
+        """ Compile the MDP by querying every state-action pair of the transition model once. """
+        super().__init__(mdp)
+        self.transitions = np.zeros(shape=[len(mdp.actions), len(mdp.states), len(mdp.states)])
+        for action_idx, action in enumerate(mdp.actions):
+            for state_idx, state in enumerate(mdp.states):
+                for trans_state, trans_probability in mdp.transitions(state, action):
+                    self.transitions[action_idx, state_idx, self.index[trans_state]] += trans_probability
+
+    def payoffs(self, value: np.ndarray) -> np.ndarray:
+        """ Expected value of the next state for every action and state as an (A, S) array. """
+        return np.einsum("ast,t->as", self.transitions, value)
+
+    def policy_payoffs(self, actions: np.ndarray) -> object:
+        transitions = self.transitions[actions, np.arange(len(actions))]
+        return lambda value: transitions @ value
+
+
+class SparseMDP(CompiledMDP):
+    """ Compiled MDP with the transition model as a CSR matrix of shape (A * S, S): row action * S + state holds the
+    probabilities of the next states in probabilities[indptr[row]:indptr[row + 1]] and their indices in indices. Memory
+    grows with the number of transitions, so MDPs with millions of states and few successors per action fit. """
+    def __init__(self, mdp: MDP):
+        """ Compile the MDP by querying every state-action pair of the transition model once. """
+        super().__init__(mdp)
+        indptr, indices, probabilities = array.array("q", [0]), array.array("i"), array.array("d")
+        for action in mdp.actions:
+            for state in mdp.states:
+                for trans_state, trans_probability in mdp.transitions(state, action):
+                    indices.append(self.index[trans_state])
+                    probabilities.append(trans_probability)
+                indptr.append(len(indices))
+        self.indptr = np.frombuffer(indptr, dtype=np.int64)
+        self.indices = np.frombuffer(indices, dtype=np.int32)
+        self.probabilities = np.frombuffer(probabilities, dtype=np.float64)
+        self.rows = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int32), np.diff(self.indptr))
+        self.forget()
+
+    def forget(self):
+        """ Drop the arrays derived from the transitions, they are built again when first needed. """
+        self.lists = None
+        self.row_actions, self.row_states = None, None
+        self.reverse = None
+        self.cumulative = None
+
+    def update(self, states: set):
+        """ Compile again the rewards and transitions of the given states after the MDP changed them, querying only
+        those states. The CSR arrays are rebuilt with array operations that move the other rows unchanged. """
+        count, changed = len(self.rewards), sorted(self.index[state] for state in states)
+        rows, indices, probabilities = [], [], []
+        for action_idx, action in enumerate(self.mdp.actions):
+            for idx in changed:
+                transitions = self.mdp.transitions(self.mdp.states[idx], action)
+                rows.extend([action_idx * count + idx] * len(transitions))
+                indices.extend(self.index[trans_state] for trans_state, _ in transitions)
+                probabilities.extend(trans_probability for _, trans_probability in transitions)
+        for idx in changed:
+            self.rewards[idx] = self.mdp.reward(self.mdp.states[idx])
+        kept = ~np.isin(self.rows % count, changed)
+        rows = np.concatenate([self.rows[kept], np.array(rows, dtype=np.int32)])
+        # A stable sort keeps the order of the next states within every row.
+        order = np.argsort(rows, kind="stable")
+        self.rows = rows[order]
+        self.indices = np.concatenate([self.indices[kept], np.array(indices, dtype=np.int32)])[order]
+        self.probabilities = np.concatenate([self.probabilities[kept], np.array(probabilities, dtype=float)])[order]
+        self.indptr = np.zeros(shape=[len(self.indptr)], dtype=np.int64)
+        np.cumsum(np.bincount(self.rows, minlength=len(self.indptr) - 1), out=self.indptr[1:])
+        self.forget()
+
+    def payoffs(self, value: np.ndarray) -> np.ndarray:
+        weights = self.probabilities * value[self.indices]
+        payoffs = np.bincount(self.rows, weights=weights, minlength=len(self.indptr) - 1)
+        return payoffs.reshape(len(self.mdp.actions), len(self.rewards))
+
+    def policy_payoffs(self, actions: np.ndarray) -> object:
+        states = len(self.rewards)
+        if self.row_states is None:
+            self.row_actions, self.row_states = np.divmod(self.rows, states)
+        selected = self.row_actions == actions[self.row_states]
+        rows, indices, probabilities = self.row_states[selected], self.indices[selected], self.probabilities[selected]
+        return lambda value: np.bincount(rows, weights=probabilities * value[indices], minlength=states)
+
+    def state_backup(self, state: int, value: list) -> float:
+        """ Bellman optimality backup of a single state for solvers that update one state at a time. Works on Python
+        lists, which are much faster than NumPy arrays when indexed element by element. """
+        if self.lists is None:
+            self.lists = self.indptr.tolist(), self.indices.tolist(), self.probabilities.tolist(), self.rewards.tolist()
+        indptr, indices, probabilities, rewards = self.lists
+        optimal_payoff = float("-inf")
+        for row in range(state, len(indptr) - 1, len(rewards)):
+            action_payoff = 0.0
+            for position in range(indptr[row], indptr[row + 1]):
+                action_payoff += probabilities[position] * value[indices[position]]
+            optimal_payoff = max(optimal_payoff, action_payoff)
+        return rewards[state] + self.gamma * optimal_payoff
+
+    def sample(self, states: np.ndarray, actions: np.ndarray, uniforms: np.ndarray) -> np.ndarray:
+        """ Sample next state indices for arrays of states and actions from uniform numbers in [0, 1).
+        Cumulative probabilities of every row are precomputed once, and all samples are bisected at once, each within
+        the cumulative probabilities of it's own row, so sampling takes O(log k) steps for k next states per row.
+        States without transitions, which are terminal, stay where they are. """
+        if self.cumulative is None:
+            cumulative = np.cumsum(self.probabilities)
+            row_starts = np.concatenate([[0.0], cumulative])[self.indptr[:-1]]
+            self.cumulative = cumulative - np.repeat(row_starts, np.diff(self.indptr))
+        rows = actions * len(self.rewards) + states
+        low, high = self.indptr[rows], self.indptr[rows + 1] - 1
+        terminal = high < low
+        high = np.maximum(high, low)
+        # Find the first position whose cumulative probability exceeds the uniform, the last one absorbs round-off.
+        while (low < high).any():
+            middle = (low + high) // 2
+            right = self.cumulative[np.minimum(middle, len(self.cumulative) - 1)] <= uniforms
+            low, high = np.where(right, middle + 1, low), np.where(right, high, middle)
+        return np.where(terminal, states, self.indices[np.minimum(low, len(self.indices) - 1)])
+
+    def predecessors(self) -> tuple:
+        """ Reverse dependency index as CSR arrays (indptr, indices): the states with a transition into a state are
+        indices[indptr[state]:indptr[state + 1]], each listed once. """
+        if self.reverse is None:
+            states = len(self.rewards)
+            pairs = np.unique(self.indices.astype(np.int64) * states + self.rows % states)
+            targets, sources = np.divmod(pairs, states)
+            indptr = np.zeros(shape=[states + 1], dtype=np.int64)
+            np.cumsum(np.bincount(targets, minlength=states), out=indptr[1:])
+            self.reverse = indptr, sources.astype(np.int32)
+        return self.reverse
+
+
 class ReinforcementLearning:
     """ A tool-set of functions for finding optimal policy for a given Markov Decision Process (MDP).
     The tool-set internals take advantage of action-value function that ultimately gives the expected payoff of taking
@@ -124,6 +494,9 @@ class ReinforcementLearning:
             if dict is not None:
                 self.update(dict)
             self.mdp = mdp
+            self.report = None
+            self.value = None
+            self.model = None
 
         @classmethod
         def extract(cls, mdp: MDP, value_function: dict) -> object:
@@ -142,6 +515,14 @@ class ReinforcementLearning:
                 policy[state] = optimal_action
             return policy
 
+        @classmethod
+        def greedy(cls, model: CompiledMDP, value: np.ndarray) -> object:
+            """ Extract the optimal policy from a compiled MDP and it's value function array by taking the action with
+            the highest expected payoff in every state at once. """
+            mdp = model.mdp
+            optimal_actions = model.payoffs(value).argmax(axis=0)
+            return cls(mdp, {state: mdp.actions[idx] for state, idx in zip(mdp.states, optimal_actions.tolist())})
+
         def __repr__(self):
             mdp = self.mdp
             actions_vismap = mdp.actions_vismap()
@@ -151,62 +532,820 @@ class ReinforcementLearning:
                 visuals[mdp.states.index(terminal)] = states_vismap[terminal]
             return ''.join(visuals)
 
+    class CompiledPolicy(collections.abc.Mapping):
+        """ Read-only policy stored as an array with the action index of every state, for serving large policies
+        solved offline. When the states are 0 .. n - 1 a state is it's own index into the array, other integer states
+        are kept as a sorted array and found by binary search, any other states are listed in the file and indexed by a
+        dictionary built on the first lookup. The file holds a small header, the actions and non-integer states as
+        JSON, then the sorted integer states and the action index array, which are memory-mapped when loaded. """
+        magic = b"PLCY"
+        header = struct.Struct("<4sQI")
+
+        def __init__(self, actions: list, choices: np.ndarray, integers: np.ndarray = None, states: list = None):
+            """ Construct the policy from the actions and the action index array of states 0 .. n - 1, or of the
+            sorted array of integer states or the list of states if given. """
+            self.actions = actions
+            self.choices = choices
+            self.integers = integers
+            self.states = states
+            self.index = None
+            self.dense = integers is None and states is None
+            # Indexing a memoryview is several times faster than indexing a NumPy array element by element.
+            self.view = memoryview(np.ascontiguousarray(choices))
+
+        @classmethod
+        def of(cls, policy: dict) -> object:
+            """ Compile a policy dictionary with hashable actions into an action index array. """
+            actions = list(dict.fromkeys(policy.values()))
+            action_index = {action: idx for idx, action in enumerate(actions)}
+            dtype = np.uint8 if len(actions) <= 256 else np.int32
+            choices = np.fromiter((action_index[action] for action in policy.values()), dtype=dtype, count=len(policy))
+            if not all(isinstance(state, (int, np.integer)) for state in policy):
+                return cls(actions, choices, states=list(policy))
+            integers = np.fromiter(policy, dtype=np.int64, count=len(policy))
+            order = np.argsort(integers, kind="stable")
+            integers, choices = integers[order], choices[order]
+            # Sorted unique integers from 0 to n - 1 are exactly 0 .. n - 1 and need not be stored.
+            if len(integers) == 0 or integers[0] == 0 and integers[-1] == len(integers) - 1:
+                return cls(actions, choices)
+            return cls(actions, choices, integers)
+
+        def position(self, state: object) -> int:
+            """ Position of the state in the action index array, raises KeyError for unknown states. States are
+            matched like dictionary keys, so a state equal to an integer state, such as 1.0 or True for 1, finds it. """
+            if self.states is None and not isinstance(state, (int, np.integer)):
+                hash(state)
+                try:
+                    integer = int(state)
+                except (TypeError, ValueError, OverflowError):
+                    raise KeyError(state) from None
+                if integer != state:
+                    raise KeyError(state)
+                state = integer
+            if self.dense:
+                if 0 <= state < len(self.view):
+                    return state
+                raise KeyError(state)
+            if self.integers is None:
+                if self.index is None:
+                    self.index = {state: idx for idx, state in enumerate(self.states)}
+                return self.index[state]
+            idx = int(np.searchsorted(self.integers, state))
+            if idx == len(self.integers) or self.integers[idx] != state:
+                raise KeyError(state)
+            return idx
+
+        def choose(self, states: object) -> np.ndarray:
+            """ Action indices of an array of integer states at once, for stepping many environments, raises KeyError
+            for unknown states. Policies of non-integer states take a list, and arrays of other than integers are
+            looked up one state at a time like by position. """
+            if self.states is not None:
+                return self.choices[np.array([self.position(state) for state in states], dtype=np.int64)]
+            states = np.asarray(states)
+            if states.size == 0:
+                return self.choices[:0]
+            if not np.issubdtype(states.dtype, np.integer):
+                positions = np.array([self.position(state) for state in states.ravel().tolist()], dtype=np.int64)
+                return self.choices[positions.reshape(states.shape)]
+            if self.dense:
+                missing = (states < 0) | (states >= len(self.choices))
+                if missing.any():
+                    raise KeyError(states[missing][0])
+                return self.choices[states]
+            positions = np.minimum(np.searchsorted(self.integers, states), len(self.integers) - 1)
+            missing = self.integers[positions] != states
+            if missing.any():
+                raise KeyError(states[missing][0])
+            return self.choices[positions]
+
+        def __getitem__(self, state: object) -> object:
+            try:
+                # Fast path for states 0 .. n - 1, other states raise TypeError or fail the bounds check.
+                if self.dense and state >= 0:
+                    return self.actions[self.view[state]]
+            except (TypeError, IndexError):
+                pass
+            return self.actions[self.view[self.position(state)]]
+
+        def __iter__(self):
+            if self.dense:
+                return iter(range(len(self.choices)))
+            return iter(self.states if self.integers is None else self.integers.tolist())
+
+        def __len__(self) -> int:
+            return len(self.choices)
+
+        def save(self, path: str):
+            """ Write the policy file, the arrays are aligned to 8 bytes so they can be mapped in place. """
+            metadata = {"actions": self.actions, "dtype": self.choices.dtype.str, "states": self.states,
+                        "integers": self.integers is not None}
+            metadata = json.dumps(metadata).encode()
+            metadata += b" " * (-(self.header.size + len(metadata)) % 8)
+            with open(path, "wb") as file:
+                file.write(self.header.pack(self.magic, len(self.choices), len(metadata)))
+                file.write(metadata)
+                if self.integers is not None:
+                    file.write(np.ascontiguousarray(self.integers, dtype="<i8").tobytes())
+                file.write(np.ascontiguousarray(self.choices).tobytes())
+
+        @classmethod
+        def load(cls, path: str) -> object:
+            """ Memory-map a policy file without reading the arrays, lookups only load the pages they touch. JSON
+            lists of actions and states are turned back into tuples. """
+            with open(path, "rb") as file:
+                mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, states, length = cls.header.unpack_from(mapping)
+            if magic != cls.magic:
+                raise ValueError("{} is not a policy file".format(path))
+            metadata = json.loads(bytes(mapping[cls.header.size:cls.header.size + length]))
+            hashable = lambda item: tuple(hashable(part) for part in item) if isinstance(item, list) else item
+            actions = [hashable(action) for action in metadata["actions"]]
+            offset, integers = cls.header.size + length, None
+            if metadata["integers"]:
+                integers = np.frombuffer(mapping, dtype="<i8", count=states, offset=offset)
+                offset += integers.nbytes
+            choices = np.frombuffer(mapping, dtype=metadata["dtype"], count=states, offset=offset)
+            if offset + choices.nbytes != len(mapping):
+                raise ValueError("{} is not a policy file".format(path))
+            states = None if metadata["states"] is None else [hashable(state) for state in metadata["states"]]
+            return cls(actions, choices, integers, states)
+
+    Report = collections.namedtuple("Report", ["solver", "iterations", "residual", "seconds"])
+    Report.__qualname__ = "ReinforcementLearning.Report"  # Lets reports from worker processes be unpickled.
+    solvers = ["value_iteration", "policy_iteration", "gauss_seidel", "prioritized_sweeping",
+               "modified_policy_iteration"]
+    dense_limit = 2048
+    state_by_state_limit = 2500
+
     @classmethod
-    def value_iteration(cls, mdp: MDP, max_iter: int = 10) -> Policy:
+    def compile(cls, mdp: MDP) -> CompiledMDP:
+        """ Compile the MDP into a dense transition tensor if it's small and into sparse CSR arrays otherwise. """
+        if len(mdp.states) <= cls.dense_limit:
+            return DenseMDP(mdp)
+        return SparseMDP(mdp)
+
+    @classmethod
+    def solved(cls, solver: str, model: CompiledMDP, value: np.ndarray, iterations: int, started: float) -> Policy:
+        """ Extract the policy of the final value function and attach a report with the Bellman residual. """
+        policy = cls.Policy.greedy(model, value)
+        residual = float(np.abs(model.backup(value) - value).max())
+        policy.report = cls.Report(solver, iterations, residual, time.perf_counter() - started)
+        policy.value = value
+        return policy
+
+    @classmethod
+    def initial_value(cls, model: CompiledMDP, warm_start: object = None) -> np.ndarray:
+        """ Value function array a solver starts from: zeros for a cold start, otherwise the warm start which is a value
+        function array, a dictionary from states to values or a previous policy. A policy gives it's solved value
+        function, or the evaluation of it's actions if it has none. States unknown to the warm start start at 0. """
+        states = model.mdp.states
+        if warm_start is None:
+            return np.zeros(shape=[len(states)])
+        if isinstance(warm_start, cls.Policy):
+            if warm_start.value is None:
+                return model.evaluate(cls.initial_actions(model, warm_start))
+            if warm_start.mdp.states == states:
+                return np.array(warm_start.value, dtype=float)
+            warm_start = dict(zip(warm_start.mdp.states, warm_start.value.tolist()))
+        if isinstance(warm_start, dict):
+            return np.array([warm_start.get(state, 0.0) for state in states], dtype=float)
+        return np.array(warm_start, dtype=float)
+
+    @classmethod
+    def initial_actions(cls, model: CompiledMDP, warm_start: object = None) -> np.ndarray:
+        """ Action index array a policy based solver starts from: the actions of a previous policy, the greedy actions
+        of a warm start value function or random actions for a cold start and states the policy doesn't cover. """
+        mdp = model.mdp
+        if warm_start is None:
+            return np.array([random.randrange(len(mdp.actions)) for _ in mdp.states], dtype=int)
+        if not isinstance(warm_start, cls.Policy):
+            return model.payoffs(cls.initial_value(model, warm_start)).argmax(axis=0)
+        action_index = {action: idx for idx, action in enumerate(mdp.actions)}
+        return np.array([action_index[warm_start[state]] if state in warm_start else random.randrange(len(mdp.actions))
+                         for state in mdp.states], dtype=int)
+
+    @classmethod
+    def compare(cls, mdp: MDP, solvers: list = None) -> list:
+        """ Run the solvers on the MDP and return their reports, to pick the fastest one for an MDP shape. """
+        return [getattr(cls, solver)(mdp).report for solver in (solvers or cls.solvers)]
+
+    @classmethod
+    def benchmark(cls, sizes: list = (10, 30, 100), solvers: list = None, output: object = sys.stdout,
+                  max_iter: int = 10 ** 5, tolerance: float = 1e-6):
+        """ Time the solvers on gridworlds with slip, random sparse MDPs and mazes of the given side lengths and
+        write one JSON line per run with the report, the MDP shape and the peak memory traced during the run, the
+        seconds include the tracing overhead. Every solver runs until it reaches the tolerance, with max_iter sweeps
+        as a safety cap, or max_iter sweeps worth of single state backups for prioritized sweeping, and converged tells
+        whether the Bellman residual of the final value function is within tolerance.
+        Solvers that back up one state at a time in Python are skipped above state_by_state_limit states. """
+        families = {"gridworld": lambda size: GridWorld(size, seed=0),
+                    "random": lambda size: RandomMDP(size * size, seed=0),
+                    "maze": lambda size: MazeMDP(size, seed=0)}
+        for family, construct in families.items():
+            for size in sizes:
+                try:
+                    mdp = construct(size)
+                except ImportError as error:
+                    print(json.dumps({"family": family, "size": size, "skipped": str(error)}), file=output)
+                    break
+                transitions = sum(len(mdp.transitions(state, action)) for state in mdp.states for action in mdp.actions)
+                for solver in solvers or cls.solvers:
+                    state_by_state = solver in ("gauss_seidel", "prioritized_sweeping")
+                    if state_by_state and len(mdp.states) > cls.state_by_state_limit:
+                        continue
+                    cap = max_iter * len(mdp.states) if solver == "prioritized_sweeping" else max_iter
+                    # Every run starts from the same random initial policy.
+                    random.seed(0)
+                    tracemalloc.start()
+                    report = getattr(cls, solver)(mdp, max_iter=cap, tolerance=tolerance).report
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    result = {"family": family, "size": size, "states": len(mdp.states), "actions": len(mdp.actions),
+                              "transitions": transitions, "peak_bytes": peak}
+                    result.update(report._asdict())
+                    result["converged"] = report.residual <= tolerance
+                    print(json.dumps(result), file=output, flush=True)
+
+    @classmethod
+    def value_iteration(cls, mdp: MDP, max_iter: int = 1000, tolerance: float = 1e-6,
+                        warm_start: object = None) -> Policy:
         """ Find and return the optimal policy for the MDP.
         The function uses the following version of the value iteration algorithm:
-            0. Set value function for all states to 0.
-            1. For every state update the value function to:
-                  value[state] = reward[state] + gamma * optimal_payoff
-               Where optimal_payoff is the maximum of expected payoffs when taking
-               each action allowed from the current state.
-            2. Goto 1. unless max_iter is reached.
+            0. Compile the MDP into a transition tensor and reward vector and set value function for all states to 0,
+               or to the warm start value function or previous policy, see initial_value.
+            1. For all states at once update the value function to:
+                  value = reward + gamma * optimal_payoff
+               Where optimal_payoff is the maximum over actions of the expected payoffs transitions[action] @ value.
+            2. Goto 1. unless the largest change of the value function is below tolerance or max_iter is reached.
             3. Extract the final optimal policy from the value function. """
-        value = {state: 0 for state in mdp.states}
-        for _ in range(max_iter):
+        started = time.perf_counter()
+        model = cls.compile(mdp)
+        value = cls.initial_value(model, warm_start)
+        for iterations in range(1, max_iter + 1):
+            updated_value = model.backup(value)
+            residual = np.abs(updated_value - value).max()
+            value = updated_value
+            if residual < tolerance:
+                break
 
-            for state in mdp.states:
-                optimal_payoff = 0
-                for action in mdp.actions:
-                    action_payoff = 0
-                    for trans_state, trans_probability in mdp.transitions(state, action):
-                        trans_idx = mdp.states.index(trans_state)
-                        action_payoff += value[trans_idx] * trans_probability
-                    optimal_payoff = max(optimal_payoff, action_payoff)
+        return cls.solved("value_iteration", model, value, iterations, started)
+
+    @classmethod
+    def policy_iteration(cls, mdp: MDP, max_iter: int = 1000, tolerance: float = 1e-6,
+                         warm_start: object = None) -> Policy:
+        """ Find and return the optimal policy for the MDP.
+        The function uses the following version of the policy iteration algorithm:
+            0. Compile the MDP into sparse CSR transitions and choose a random policy, or start from the warm start
+               policy or value function, see initial_actions.
+            1. Evaluate the policy with the BiCGSTAB solver, starting from the value function of the previous policy,
+               to a tenth of the Bellman residual of that value function, so early policies are evaluated loosely.
+            2. Extract new policy from the value function, keeping the current action unless another is better.
+            3. Goto 1. unless the Bellman residual of the value function is below tolerance or max_iter is reached. """
+        started = time.perf_counter()
+        model = SparseMDP(mdp)
+        states = np.arange(len(mdp.states))
+        actions = cls.initial_actions(model, warm_start)
+        value = cls.initial_value(model, warm_start)
+        residual = np.abs(model.backup(value) - value).max()
+        for iterations in range(1, max_iter + 1):
+            value = model.evaluate(actions, value, 0.1 * max(residual, tolerance))
+            payoffs = model.payoffs(value)
+            optimal_payoffs = payoffs.max(axis=0)
+            residual = np.abs(model.rewards + model.gamma * optimal_payoffs - value).max()
+            if residual < tolerance:
+                break
+            actions = np.where(payoffs[actions, states] < optimal_payoffs, payoffs.argmax(axis=0), actions)
 
-                value[state] = mdp.reward(state) + mdp.gamma * optimal_payoff
+        return cls.solved("policy_iteration", model, value, iterations, started)
 
-        policy = cls.Policy.extract(mdp, value)
+    @classmethod
+    def batch_value_iteration(cls, mdps: list, max_iter: int = 1000, tolerance: float = 1e-6) -> list:
+        """ Find and return the optimal policies for many MDPs at once.
+        MDPs with the same number of states and actions are compiled into dense tensors stacked along a batch axis
+        and solved by a single vectorized value iteration loop that runs until every MDP has converged. Batches of
+        different shapes, and MDPs too large for dense tensors, are solved in parallel by a process pool. """
+        started = time.perf_counter()
+        groups = collections.defaultdict(list)
+        for idx, mdp in enumerate(mdps):
+            groups[len(mdp.states), len(mdp.actions)].append(idx)
+
+        if len(groups) == 1 and len(mdps[0].states) <= cls.dense_limit:
+            models = [DenseMDP(mdp) for mdp in mdps]
+            transitions = np.stack([model.transitions for model in models])
+            rewards = np.stack([model.rewards for model in models])
+            gammas = np.array([[model.gamma] for model in models])
+            value = np.zeros(shape=rewards.shape)
+            for iterations in range(1, max_iter + 1):
+                updated_value = rewards + gammas * np.einsum("bast,bt->bas", transitions, value).max(axis=1)
+                residual = np.abs(updated_value - value).max()
+                value = updated_value
+                if residual < tolerance:
+                    break
+
+            payoffs = np.einsum("bast,bt->bas", transitions, value)
+            residuals = np.abs(rewards + gammas * payoffs.max(axis=1) - value).max(axis=1)
+            seconds = time.perf_counter() - started
+            policies = []
+            for mdp, optimal_actions, residual, mdp_value in zip(mdps, payoffs.argmax(axis=1).tolist(), residuals.tolist(),
+                                                                 value):
+                policy = cls.Policy(mdp, {state: mdp.actions[idx] for state, idx in zip(mdp.states, optimal_actions)})
+                policy.report = cls.Report("batch_value_iteration", iterations, residual, seconds)
+                policy.value = mdp_value
+                policies.append(policy)
+            return policies
+
+        policies = [None] * len(mdps)
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            futures = {}
+            for (states, _), indices in groups.items():
+                if states <= cls.dense_limit:
+                    batch = [mdps[idx] for idx in indices]
+                    futures[executor.submit(cls.batch_value_iteration, batch, max_iter, tolerance)] = indices
+                else:
+                    for idx in indices:
+                        futures[executor.submit(cls.value_iteration, mdps[idx], max_iter, tolerance)] = [idx]
+            for future, indices in futures.items():
+                result = future.result()
+                for idx, policy in zip(indices, result if isinstance(result, list) else [result]):
+                    # Policies come back with a copy of their MDP from the worker process.
+                    policy.mdp = mdps[idx]
+                    policies[idx] = policy
+        return policies
+
+    @classmethod
+    def temporal_difference(cls, mdp: MDP, solver: str, episodes: int, environments: int, alpha: float,
+                            epsilon: float, max_steps: int, seed: int) -> Policy:
+        """ Model-free learning of a Q-table of shape (S, A) by epsilon-greedy episodes run in parallel as a vector of
+        environments. Each step all environments pick actions, sample their next states from the precomputed
+        cumulative transition tables and update the Q-table at once, with the target:
+            reward[state] + gamma * q[next_state, next_action]
+        Where next_action is the greedy action for Q-learning and the action actually taken next for SARSA.
+        Terminal states have no transitions, so their Q-values are fixed to their reward. Finished environments
+        restart from a random non-terminal state until the requested number of episodes has been played. """
+        started = time.perf_counter()
+        model = SparseMDP(mdp)
+        generator = np.random.default_rng(seed)
+        terminals = np.zeros(shape=[len(mdp.states)], dtype=bool)
+        terminals[[model.index[terminal] for terminal in mdp.terminals]] = True
+        starts = np.flatnonzero(~terminals)
+        q = np.zeros(shape=[len(mdp.states), len(mdp.actions)])
+        q[terminals] = model.rewards[terminals, None]
+
+        def choose(states):
+            greedy = q[states].argmax(axis=1)
+            explore = generator.random(len(states)) < epsilon
+            return np.where(explore, generator.integers(len(mdp.actions), size=len(states)), greedy)
+
+        environments = min(environments, episodes)
+        states = generator.choice(starts, size=environments)
+        actions = choose(states)
+        steps = np.zeros(shape=[environments], dtype=int)
+        started_episodes, iterations = environments, 0
+        active = np.ones(shape=[environments], dtype=bool)
+        while active.any():
+            states, actions, steps = states[active], actions[active], steps[active]
+            next_states = model.sample(states, actions, generator.random(len(states)))
+            next_actions = choose(next_states)
+            if solver == "sarsa":
+                next_payoffs = q[next_states, next_actions]
+            else:
+                next_payoffs = q[next_states].max(axis=1)
+            targets = model.rewards[states] + model.gamma * next_payoffs
+            # Environments updating the same pair in one step overwrite each other, one of the updates is kept.
+            q[states, actions] += alpha * (targets - q[states, actions])
+            iterations += len(states)
+
+            states, actions, steps = next_states, next_actions, steps + 1
+            finished = terminals[states] | (steps >= max_steps)
+            restarts = np.flatnonzero(finished)[:episodes - started_episodes]
+            states[restarts] = generator.choice(starts, size=len(restarts))
+            actions[restarts] = choose(states[restarts])
+            steps[restarts] = 0
+            started_episodes += len(restarts)
+            active = ~finished
+            active[restarts] = True
+
+        optimal_actions = q.argmax(axis=1).tolist()
+        policy = cls.Policy(mdp, {state: mdp.actions[idx] for state, idx in zip(mdp.states, optimal_actions)})
+        value = q.max(axis=1)
+        residual = float(np.abs(model.backup(value) - value).max())
+        policy.report = cls.Report(solver, iterations, residual, time.perf_counter() - started)
+        policy.value = value
+        policy.q_table = q
         return policy
 
     @classmethod
-    def policy_iteration(cls, mdp: MDP, max_iter: int = 5) -> Policy:
+    def q_learning(cls, mdp: MDP, episodes: int = 10000, environments: int = 256, alpha: float = 0.1,
+                   epsilon: float = 0.1, max_steps: int = 1000, seed: int = None) -> Policy:
+        """ Find and return a policy for the MDP by off-policy Q-learning, see temporal_difference. The report counts
+        environment steps as iterations, so iterations / seconds is the training throughput in steps per second. """
+        return cls.temporal_difference(mdp, "q_learning", episodes, environments, alpha, epsilon, max_steps, seed)
+
+    @classmethod
+    def sarsa(cls, mdp: MDP, episodes: int = 10000, environments: int = 256, alpha: float = 0.1,
+              epsilon: float = 0.1, max_steps: int = 1000, seed: int = None) -> Policy:
+        """ Find and return a policy for the MDP by on-policy SARSA, see temporal_difference. """
+        return cls.temporal_difference(mdp, "sarsa", episodes, environments, alpha, epsilon, max_steps, seed)
+
+    @classmethod
+    def gauss_seidel(cls, mdp: MDP, max_iter: int = 1000, tolerance: float = 1e-6, warm_start: object = None) -> Policy:
         """ Find and return the optimal policy for the MDP.
-        The function uses the following version of the policy iteration algorithm:
-            0. Choose a random policy
-            1. Solve Bellman's system of linear equations and get the value function for the policy.
-            2. Extract new policy from the value function.
-            3. Goto 1. unless max_iter is reached. """
-        policy = cls.Policy(mdp, {state: random.choice(mdp.actions) for state in mdp.states})
-        bellman_matrix = np.empty(shape=[len(mdp.states), len(mdp.states)])
-        reward = np.empty(shape=[len(mdp.states), 1])
-        for _ in range(max_iter):
-
-            bellman_matrix[:, :], reward[:] = 0, 0
-            for idx, state in enumerate(mdp.states):
-                for trans_state, trans_probability in mdp.transitions(state, policy[state]):
-                    trans_idx = mdp.states.index(trans_state)
-                    bellman_matrix[idx, trans_idx] = - mdp.gamma * trans_probability
-                bellman_matrix[idx, idx] += 1
-                reward[idx] = mdp.reward(state)
-
-            value = np.linalg.solve(bellman_matrix, reward)
-            policy = cls.Policy.extract(mdp, {state: value[idx, 0] for idx, state in enumerate(mdp.states)})
+        The function uses in-place Gauss-Seidel value iteration:
+            0. Compile the MDP into sparse CSR transitions and set value function for all states to 0 or the warm start.
+            1. Sweep over the states and back up each one in place, so later states of the sweep already see the
+               values updated earlier in the same sweep.
+            2. Goto 1. unless the largest change within the sweep is below tolerance or max_iter is reached.
+            3. Extract the final optimal policy from the value function. """
+        started = time.perf_counter()
+        model = SparseMDP(mdp)
+        value = cls.initial_value(model, warm_start).tolist()
+        for iterations in range(1, max_iter + 1):
+            residual = 0.0
+            for state in range(len(value)):
+                updated_value = model.state_backup(state, value)
+                residual = max(residual, abs(updated_value - value[state]))
+                value[state] = updated_value
+            if residual < tolerance:
+                break
 
+        return cls.solved("gauss_seidel", model, np.array(value), iterations, started)
+
+    @classmethod
+    def prioritized_sweeping(cls, mdp: MDP, max_iter: int = 10 ** 7, tolerance: float = 1e-6,
+                             warm_start: object = None) -> Policy:
+        """ Find and return the optimal policy for the MDP.
+        The function uses asynchronous value iteration ordered by a priority queue of Bellman errors:
+            0. Compile the MDP into sparse CSR transitions, set value function for all states to 0 or the warm start
+               and queue every state by the change a backup would make to it's value.
+            1. Back up the state with the largest queued error.
+            2. Re-compute the errors of it's predecessors from the reverse dependency index and queue those above
+               tolerance.
+            3. Goto 1. unless the queue is empty or max_iter backups were done.
+            4. Extract the final optimal policy from the value function.
+        Iterations are counted in single state backups. """
+        started = time.perf_counter()
+        model = SparseMDP(mdp)
+        value = cls.initial_value(model, warm_start)
+        errors = np.abs(model.backup(value) - value).tolist()
+        value = value.tolist()
+        iterations = cls.sweep(model, value, errors, max_iter, tolerance)
+        return cls.solved("prioritized_sweeping", model, np.array(value), iterations, started)
+
+    @classmethod
+    def sweep(cls, model: SparseMDP, value: list, errors: list, max_iter: int, tolerance: float) -> int:
+        """ Prioritized sweeping of the value function list in place, starting from the states with Bellman errors
+        above tolerance. Returns the number of single state backups done. """
+        predecessor_indptr, predecessor_indices = (indices.tolist() for indices in model.predecessors())
+        queue = [(-error, state) for state, error in enumerate(errors) if error > tolerance]
+        heapq.heapify(queue)
+        priorities = errors
+        iterations = 0
+        while len(queue) > 0 and iterations < max_iter:
+            priority, state = heapq.heappop(queue)
+            if -priority != priorities[state]:
+                continue
+            priorities[state] = 0.0
+            value[state] = model.state_backup(state, value)
+            iterations += 1
+            for position in range(predecessor_indptr[state], predecessor_indptr[state + 1]):
+                predecessor = predecessor_indices[position]
+                error = abs(model.state_backup(predecessor, value) - value[predecessor])
+                if error > tolerance and error > priorities[predecessor]:
+                    priorities[predecessor] = error
+                    heapq.heappush(queue, (-error, predecessor))
+        return iterations
+
+    @classmethod
+    def replan(cls, mdp: MDP, warm_start: object, changed: set, max_iter: int = 10 ** 7,
+               tolerance: float = 1e-6) -> Policy:
+        """ Find and return the optimal policy for an MDP whose rewards or transitions changed only in the given
+        states, re-using the previous policy or value function solved before the change:
+            0. Compile the MDP again, when it's wrapped in a CachedMDP the entries of the changed states are forgotten
+               and the other states come from the cache. A policy returned by replan keeps it's compiled model, which
+               only the changed states are compiled into again when replanning from it.
+            1. Start from the previous value function and queue only the changed states by their Bellman error.
+            2. Prioritized sweeping carries the changes backwards through the reverse dependency index, so states
+               whose value isn't affected are never backed up again.
+        Iterations are counted in single state backups, a small fraction of a cold start for local changes. """
+        started = time.perf_counter()
+        if isinstance(mdp, CachedMDP):
+            mdp.forget(changed)
+        model = getattr(warm_start, "model", None)
+        if model is not None and model.mdp is mdp:
+            model.update(changed)
+        else:
+            model = SparseMDP(mdp)
+        value = cls.initial_value(model, warm_start).tolist()
+        errors = [0.0] * len(value)
+        for state in changed:
+            idx = model.index[state]
+            errors[idx] = abs(model.state_backup(idx, value) - value[idx])
+        iterations = cls.sweep(model, value, errors, max_iter, tolerance)
+        policy = cls.solved("replan", model, np.array(value), iterations, started)
+        policy.model = model
         return policy
 
+    @classmethod
+    def modified_policy_iteration(cls, mdp: MDP, evaluation_sweeps: int = 5, max_iter: int = 1000,
+                                  tolerance: float = 1e-6, warm_start: object = None) -> Policy:
+        """ Find and return the optimal policy for the MDP.
+        The function uses modified policy iteration, which evaluates each policy only approximately:
+            0. Compile the MDP and set value function for all states to 0 or the warm start.
+            1. Extract the greedy policy and back up the value function once as in value iteration.
+            2. Stop if the largest change of the value function is below tolerance or max_iter is reached.
+            3. Run evaluation_sweeps sweeps of policy evaluation for the greedy policy and goto 1. """
+        started = time.perf_counter()
+        model = cls.compile(mdp)
+        value = cls.initial_value(model, warm_start)
+        for iterations in range(1, max_iter + 1):
+            payoffs = model.payoffs(value)
+            updated_value = model.rewards + model.gamma * payoffs.max(axis=0)
+            residual = np.abs(updated_value - value).max()
+            value = updated_value
+            if residual < tolerance:
+                break
+            policy_payoffs = model.policy_payoffs(payoffs.argmax(axis=0))
+            for _ in range(evaluation_sweeps):
+                value = model.rewards + model.gamma * policy_payoffs(value)
+
+        return cls.solved("modified_policy_iteration", model, value, iterations, started)
+
+
+class TestReinforcementLearning(unittest.TestCase):
+    def testValueIteration(self):
+        random.seed(0)
+        for _ in range(20):
+            game = SheriffChase1D()
+            policy = ReinforcementLearning.value_iteration(game)
+            for state in set(game.states) - game.terminals:
+                game.state, steps = state, 0
+                while not game.finished() and steps < len(game.states):
+                    game.action(policy[game.state])
+                    steps += 1
+                self.assertEqual(game.state, game.criminal)
+
+    class Ring(MDP):
+        """ Stochastic ring where actions move in the intended direction with probability 0.8. """
+        def __init__(self, size: int):
+            super().__init__(0, list(range(size)), [-1, +1], {size // 2}, gamma=0.99)
+
+        def transitions(self, state: object, action: object) -> list:
+            if self.finished(state):
+                return []
+            return [((state + action) % len(self.states), 0.8), ((state - action) % len(self.states), 0.2)]
+
+        def reward(self, state: object = None) -> float:
+            return 1.0 if state in self.terminals else -0.01
+
+    def testSparseMDP(self):
+        ring = self.Ring(50)
+        dense, sparse = DenseMDP(ring), SparseMDP(ring)
+        value = np.random.default_rng(0).random(50)
+        self.assertTrue(np.allclose(dense.payoffs(value), sparse.payoffs(value)))
+        actions = np.random.default_rng(1).integers(0, 2, size=50)
+        self.assertTrue(np.allclose(dense.evaluate(actions), sparse.evaluate(actions)))
+        self.assertEqual(sparse.indptr[-1], 2 * 2 * 49)
+
+    def testPolicyIteration(self):
+        random.seed(2)
+        ring = self.Ring(201)
+        policy = ReinforcementLearning.policy_iteration(ring)
+        self.assertEqual(policy, ReinforcementLearning.value_iteration(ring))
+        for state in ring.states:
+            if state not in ring.terminals:
+                self.assertEqual(policy[state], +1 if state < 100 else -1)
+
+    def testCachedMDP(self):
+        random.seed(3)
+        game = SheriffChase1D()
+        cache = CachedMDP(game)
+        policy = ReinforcementLearning.value_iteration(cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 30))
+        self.assertEqual(policy, ReinforcementLearning.policy_iteration(cache))
+        self.assertEqual((cache.hits, cache.misses), (30, 30))
+
+        free = [state for state in game.states if state not in game.terminals]
+        changed = game.relocate(criminal=free[0], prison=free[-1])
+        self.assertEqual(ReinforcementLearning.value_iteration(game).value[free[0]], 1.0)
+        self.assertEqual(ReinforcementLearning.replan(cache, policy, changed).value[free[0]], 1.0)
+        # Both transition lists and the reward of the changed states are queried again, the rest are cache hits.
+        self.assertEqual((cache.hits, cache.misses), (30 + 3 * (10 - len(changed)), 30 + 3 * len(changed)))
+
+        cache = CachedMDP(game, maxsize=3)
+        for state in [0, 1, 2, 0, 3, 1]:
+            cache.transitions(state, +1)
+        self.assertEqual((cache.hits, cache.misses), (1, 5))
+        self.assertEqual(list(cache.entries), [(0, +1), (3, +1), (1, +1)])
+        self.assertEqual(cache.states, game.states)
+        self.assertIs(ReinforcementLearning.value_iteration(cache).mdp, cache)
+
+    def testSolvers(self):
+        random.seed(4)
+        for mdp in [self.Ring(201), SheriffChase1D(), SheriffChase1D()]:
+            policies = [getattr(ReinforcementLearning, solver)(mdp) for solver in ReinforcementLearning.solvers]
+            for policy in policies:
+                self.assertEqual(policy, policies[0])
+                self.assertLess(policy.report.residual, 1e-4)
+                self.assertGreater(policy.report.iterations, 0)
+            reports = ReinforcementLearning.compare(mdp)
+            self.assertEqual([report.solver for report in reports], ReinforcementLearning.solvers)
+
+        ring = SparseMDP(self.Ring(7))
+        indptr, indices = ring.predecessors()
+        self.assertEqual(indices[indptr[0]:indptr[1]].tolist(), [1, 6])
+        self.assertEqual(indices[indptr[2]:indptr[3]].tolist(), [1])
+
+    def testBatchValueIteration(self):
+        random.seed(5)
+        games = [SheriffChase1D() for _ in range(200)]
+        policies = ReinforcementLearning.batch_value_iteration(games)
+        for game, policy in zip(games, policies):
+            self.assertIs(policy.mdp, game)
+            self.assertEqual(policy, ReinforcementLearning.value_iteration(game))
+
+        mixed = [self.Ring(31), games[0], self.Ring(31), self.Ring(41)]
+        policies = ReinforcementLearning.batch_value_iteration(mixed)
+        for mdp, policy in zip(mixed, policies):
+            self.assertIs(policy.mdp, mdp)
+            self.assertEqual(policy, ReinforcementLearning.value_iteration(mdp))
+
+    def testSample(self):
+        ring = SparseMDP(self.Ring(9))
+        states, actions = np.repeat(np.arange(9), 2 * 4000), np.tile(np.repeat([0, 1], 4000), 9)
+        live = states != 4
+        samples = ring.sample(states[live], actions[live], np.random.default_rng(0).random(np.count_nonzero(live)))
+        forward = samples == (states[live] + np.where(actions[live] == 1, 1, -1)) % 9
+        self.assertTrue(np.all(forward | (samples == (states[live] - np.where(actions[live] == 1, 1, -1)) % 9)))
+        self.assertAlmostEqual(forward.mean(), 0.8, delta=0.01)
+        self.assertEqual(ring.sample(np.array([4, 3]), np.array([1, 1]), np.array([0.5, 0.9])).tolist(), [4, 2])
+
+    def testTemporalDifference(self):
+        random.seed(6)
+        for seed in range(5):
+            game = SheriffChase1D()
+            optimal = ReinforcementLearning.value_iteration(game)
+            for learner in [ReinforcementLearning.q_learning, ReinforcementLearning.sarsa]:
+                policy = learner(game, episodes=2000, environments=64, epsilon=0.2, seed=seed)
+                for state in set(game.states) - game.terminals:
+                    self.assertEqual(policy[state], optimal[state])
+                self.assertGreater(policy.report.iterations, 2000)
+
+    def testBenchmarkMDPs(self):
+        world = GridWorld(6, slip=0.2, seed=0)
+        self.assertEqual(world.transitions(0, (-1, 0)), [(0, 0.8), (0, 0.1), (1, 0.1)])
+        self.assertEqual(world.transitions(7, (0, +1)), [(8, 0.8), (13, 0.1), (1, 0.1)])
+        policy = ReinforcementLearning.value_iteration(world)
+        self.assertEqual(policy[world.goal - 1], (0, +1))
+
+        random_mdp = RandomMDP(50, seed=0)
+        for state in random_mdp.states:
+            for action in random_mdp.actions:
+                self.assertAlmostEqual(sum(p for _, p in random_mdp.transitions(state, action)), 1.0)
+
+        maze = MazeMDP(12, seed=0)
+        policy = ReinforcementLearning.value_iteration(maze, max_iter=10000)
+        state, steps = maze.maze.start, 0
+        while state != maze.maze.finish:
+            (state, _), = maze.transitions(state, policy[state])
+            steps += 1
+        self.assertEqual(steps, len(maze.maze.solve()) - 1)
+
+        output = io.StringIO()
+        ReinforcementLearning.benchmark(sizes=[4], output=output)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([(result["family"], result["solver"]) for result in results],
+                         [(family, solver) for family in ["gridworld", "random", "maze"]
+                          for solver in ReinforcementLearning.solvers])
+        self.assertTrue(all(result["peak_bytes"] > 0 and result["states"] == 16 for result in results))
+        self.assertTrue(all(result["converged"] and result["residual"] <= 1e-6 for result in results))
+        output = io.StringIO()
+        ReinforcementLearning.benchmark(sizes=[4], solvers=["value_iteration"], output=output, max_iter=2)
+        self.assertFalse(any(json.loads(line)["converged"] for line in output.getvalue().splitlines()))
+
+    def testReplan(self):
+        random.seed(7)
+        world = GridWorld(20, seed=0)
+        cold = ReinforcementLearning.prioritized_sweeping(world)
+        world.pits.add(22)
+        world.terminals.add(22)
+        policy = ReinforcementLearning.replan(world, cold, {22})
+        self.assertTrue(np.allclose(policy.value, ReinforcementLearning.value_iteration(world).value, atol=1e-4))
+        self.assertLess(policy.report.iterations, cold.report.iterations / 10)
+        self.assertLess(policy.report.residual, 1e-5)
+
+        world.pits.add(23)
+        world.terminals.add(23)
+        with mock.patch.object(world, "transitions", wraps=world.transitions) as transitions:
+            replanned = ReinforcementLearning.replan(world, policy, {23})
+        self.assertEqual(transitions.call_count, len(world.actions))
+        self.assertIs(replanned.model, policy.model)
+        compiled = SparseMDP(world)
+        for name in ["indptr", "indices", "probabilities", "rows", "rewards"]:
+            self.assertTrue(np.array_equal(getattr(replanned.model, name), getattr(compiled, name)))
+        self.assertTrue(np.allclose(replanned.value, ReinforcementLearning.value_iteration(world).value, atol=1e-4))
+        world.pits.remove(23)
+        world.terminals.remove(23)
+        policy = ReinforcementLearning.replan(world, replanned, {23})
+
+        for solver in ["value_iteration", "policy_iteration", "modified_policy_iteration"]:
+            warm = getattr(ReinforcementLearning, solver)(world, warm_start=policy)
+            self.assertTrue(np.allclose(warm.value, policy.value, atol=1e-4))
+            self.assertLessEqual(warm.report.iterations, 2)
+        warm = ReinforcementLearning.gauss_seidel(world, warm_start=dict(zip(world.states, policy.value)))
+        self.assertTrue(np.allclose(warm.value, policy.value, atol=1e-4))
+
+        game = SheriffChase1D()
+        policy = ReinforcementLearning.policy_iteration(game)
+        free = [state for state in game.states if state not in game.terminals]
+        layout = game.criminal, game.prison, set(game.terminals)
+        with self.assertRaises(ValueError):
+            game.relocate(criminal=free[0], prison=free[0])
+        self.assertEqual((game.criminal, game.prison, game.terminals), layout)
+        changed = game.relocate(criminal=free[0], prison=free[-1])
+        self.assertEqual(len(changed), 4)
+        replanned = ReinforcementLearning.replan(game, policy, changed)
+        self.assertEqual(replanned, ReinforcementLearning.value_iteration(game))
+        self.assertEqual(replanned[free[1]], -1)
+
+    def testCompiledPolicy(self):
+        random.seed(8)
+        world = GridWorld(30, seed=0)
+        policy = ReinforcementLearning.value_iteration(world)
+        compiled = ReinforcementLearning.CompiledPolicy.of(policy)
+        self.assertTrue(compiled.dense)
+        self.assertEqual(compiled.choices.dtype, np.uint8)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "policy.bin")
+            compiled.save(path)
+            self.assertLess(os.path.getsize(path), len(world.states) + 256)
+            loaded = ReinforcementLearning.CompiledPolicy.load(path)
+            self.assertEqual(dict(loaded), policy)
+            self.assertEqual(loaded[world.goal - 1], (0, +1))
+            states = np.arange(len(world.states))
+            self.assertEqual([loaded.actions[idx] for idx in loaded.choose(states)], [policy[s] for s in world.states])
+            self.assertNotIn(len(world.states), loaded)
+            self.assertNotIn((0, 1), loaded)
+            with self.assertRaises(KeyError):
+                loaded.choose(np.array([-1]))
+            with self.assertRaises(KeyError):
+                loaded.choose(np.array([0.5]))
+            # States are matched like dictionary keys, by equality and hash.
+            keys = {1: policy[1]}
+            for state in [1.0, True, np.int64(1), np.float64(1.0)]:
+                self.assertEqual(state in loaded, state in keys)
+                self.assertEqual(loaded[state], keys[state])
+            for state in [1.5, "1", float("nan"), float("inf"), None]:
+                self.assertEqual(state in loaded, state in keys)
+            with self.assertRaises(TypeError):
+                [1] in loaded
+            self.assertEqual(loaded.choose(np.array([1.0, 2.0])).tolist(), loaded.choose(np.array([1, 2])).tolist())
+
+            sparse = ReinforcementLearning.CompiledPolicy.of({7: "b", -3: "a", 100: "b"})
+            self.assertEqual(sparse.integers.tolist(), [-3, 7, 100])
+            sparse.save(path)
+            loaded = ReinforcementLearning.CompiledPolicy.load(path)
+            self.assertEqual(list(loaded), [-3, 7, 100])
+            self.assertEqual((loaded[-3], loaded[100]), ("a", "b"))
+            self.assertEqual(loaded.choose(np.array([100, 7])).tolist(), [0, 0])
+            self.assertNotIn(8, loaded)
+            self.assertEqual((loaded[7.0], -3.0 in loaded, 7.5 in loaded), ("b", True, False))
+            for unknown in ([8, 6, -50], [101], [7, -4]):
+                with self.assertRaises(KeyError):
+                    loaded.choose(np.array(unknown))
+
+            named = ReinforcementLearning.CompiledPolicy.of({(0, 1): -1, "x": +1})
+            named.save(path)
+            loaded = ReinforcementLearning.CompiledPolicy.load(path)
+            self.assertEqual(dict(loaded), {(0, 1): -1, "x": +1})
+            self.assertEqual(loaded.choose(["x", (0, 1)]).tolist(), [1, 0])
+            with self.assertRaises(KeyError):
+                loaded.choose([3])
+            del loaded
+
+    def testDenseMDP(self):
+        random.seed(1)
+        game = SheriffChase1D()
+        model = DenseMDP(game)
+        self.assertEqual(model.transitions.shape, (2, 10, 10))
+        self.assertTrue(np.allclose(model.transitions.sum(axis=2)[:, list(game.terminals)], 0))
+        value = np.random.default_rng(0).random(10)
+        for state in game.states:
+            expected = max(sum(value[trans_state] * trans_probability
+                               for trans_state, trans_probability in game.transitions(state, action))
+                           for action in game.actions)
+            self.assertAlmostEqual(model.backup(value)[state], game.reward(state) + game.gamma * expected)
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reinforcement Learning")
+    parser.add_argument("--benchmark", action="store_true", help="time solvers on scalable MDPs, one JSON line per run")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 30, 100], help="side lengths of benchmark MDPs")
+    parser.add_argument("--solvers", nargs="+", choices=ReinforcementLearning.solvers, help="benchmarked solvers")
+    arguments = parser.parse_args()
+    if arguments.benchmark:
+        ReinforcementLearning.benchmark(arguments.sizes, arguments.solvers)
+        sys.exit(0)
+
     game = SheriffChase1D()
     actions_keymap = {"l": game.actions[0], "r": game.actions[1]}
     policy = ReinforcementLearning.policy_iteration(mdp=game)
@@ -1,47 +1,444 @@
-from PyQt5.QtCore import Qt, QSize, QPoint, QPropertyAnimation, QEasingCurve, pyqtProperty
+from PyQt5.QtCore import Qt, QSize, QPoint, QRect, QPropertyAnimation, QEasingCurve, pyqtProperty
 from PyQt5.QtWidgets import QApplication, QWidget, QMessageBox
-from PyQt5.QtGui import QPainter, QPen, QPalette
+from PyQt5.QtGui import QPainter, QPainterPath, QPen, QPalette, QPixmap
+import numpy as np
+import collections
+import tracemalloc
+import argparse
+import tempfile
 import random
+import heapq
+import struct
+import array
+import mmap
+import os
+import unittest
+import time
 import sys
 
 
-class QMaze(QWidget):
-    class Node:
-        def __init__(self, row, column):
-            self.row, self.column = row, column
-            self.neighbors = []
-            self.links = []
-
-        def point(self, maze):
-            return QPoint(self.column * maze.paintStep, self.row * maze.paintStep)
-
-        def closest(self, maze, point):
-            closestNode, closestDistance = None, float("inf")
-            for node in self.links:
-                delta = point - node.point(maze)
-                distance = delta.manhattanLength()
-                if distance < closestDistance:
-                    closestNode, closestDistance = node, distance
-            return closestNode
-
-        def crawl(self, direction, distance = 1):
-            if len(self.links) > 2 and distance > 1:
-                return self
-            for link in self.links:
-                if direction == (link.row - self.row, link.column - self.column):
-                    return link.crawl(direction, distance + 1)
+class Maze:
+    """ Perfect maze stored as one byte of wall bits per cell, of which only the lower four are used. Cells are
+    addressed by flat index row * size + column, and all generators carve with explicit stacks or loops instead of
+    recursion, so their memory stays a handful of bytes per cell. """
+    UP, DOWN, LEFT, RIGHT = 1, 2, 4, 8
+    WALLS = UP | DOWN | LEFT | RIGHT
+    DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+    OPPOSITE = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
+    algorithms = ("dfs", "wilson", "kruskal", "eller")
+    solvers = ("bfs", "astar", "bidirectional")
+    magic = b"MAZE"
+    header = struct.Struct("<4sI")
+    hintLimit = 10 ** 6
+
+    class Parents(dict):
+        """ Parent cells of a search that only reached a few cells, unreached cells have no parent like in the arrays. """
+        def __missing__(self, cell):
+            return -1
+
+    def __init__(self, size, algorithm="dfs", seed=None, longest=False):
+        if algorithm not in self.algorithms:
+            raise ValueError("unknown maze algorithm {}".format(algorithm))
+        self.size = size
+        self.algorithm = algorithm
+        self.random = random.Random(seed)
+        self.walls = bytearray([self.WALLS]) * (size * size)
+        getattr(self, algorithm)()
+        self.field = None
+        self.route = {}
+        self.graph = None
+        if longest:
+            self.start, self.finish = self.longest()
+        else:
+            self.start = 0
+            self.finish = self.farthest(self.start)
+
+    @classmethod
+    def stream(cls, path, size, seed=None):
+        """ Writes an Eller maze row by row to a file holding a small header and one byte of wall bits per cell. """
+        with open(path, "wb") as file:
+            file.write(cls.header.pack(cls.magic, size))
+            for walls in cls.ellerRows(size, size, random.Random(seed)):
+                file.write(walls)
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.header.pack(self.magic, self.size))
+            file.write(self.walls)
+
+    @classmethod
+    def load(cls, path):
+        """ Memory-maps a maze file, so only the pages of rows that are actually read are loaded from disk. The start
+        and finish are opposite corners, as finding the farthest cell would read the whole file. """
+        with open(path, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size = cls.header.unpack_from(mapping)
+        if magic != cls.magic or len(mapping) != cls.header.size + size * size:
+            raise ValueError("{} is not a maze file".format(path))
+        maze = cls.__new__(cls)
+        maze.size, maze.algorithm, maze.random = size, "eller", None
+        maze.walls = memoryview(mapping)[cls.header.size:]
+        maze.start, maze.finish = 0, size * size - 1
+        maze.field = None
+        maze.route = {}
+        maze.graph = None
+        return maze
+
+    @property
+    def grid(self):
+        return np.frombuffer(self.walls, dtype=np.uint8).reshape(self.size, self.size)
+
+    def neighbors(self, cell):
+        row, column = divmod(cell, self.size)
+        if row > 0:
+            yield self.UP, cell - self.size
+        if row < self.size - 1:
+            yield self.DOWN, cell + self.size
+        if column > 0:
+            yield self.LEFT, cell - 1
+        if column < self.size - 1:
+            yield self.RIGHT, cell + 1
+
+    def links(self, cell):
+        # The outer walls are never carved, so open sides always lead to a cell inside the maze.
+        walls, links = self.walls[cell], []
+        if not walls & self.UP:
+            links.append(cell - self.size)
+        if not walls & self.DOWN:
+            links.append(cell + self.size)
+        if not walls & self.LEFT:
+            links.append(cell - 1)
+        if not walls & self.RIGHT:
+            links.append(cell + 1)
+        return links
+
+    def direction(self, cell, link):
+        return {-self.size: self.UP, self.size: self.DOWN, -1: self.LEFT, 1: self.RIGHT}[link - cell]
+
+    def corridors(self):
+        """ Compresses the maze into a graph of its nodes, the junctions, dead ends and corners where a straight
+        crawl stops, while cells in the middle of straight corridors are left out. graph holds the sorted node cells
+        and, for every node and direction, the node a crawl from there ends in, or the node itself behind a wall. """
+        grid = self.grid
+        straight = np.zeros(16, dtype=bool)
+        straight[[self.LEFT | self.RIGHT, self.UP | self.DOWN]] = True
+        stops = ~straight[grid & self.WALLS]
+        nodes = np.flatnonzero(stops).astype(np.int32)
+        rows, columns = np.indices(grid.shape, dtype=np.int32)
+        ends = np.empty(shape=(len(nodes), len(self.DIRECTIONS)), dtype=np.int32)
+        for index, direction in enumerate(self.DIRECTIONS):
+            # Vertical corridors are handled as horizontal ones of the transposed grid.
+            horizontal = direction in (self.LEFT, self.RIGHT)
+            walls, nodeStops, positions = (grid, stops, columns) if horizontal else (grid.T, stops.T, rows.T)
+            closed = walls & direction != 0
+            if direction in (self.RIGHT, self.DOWN):
+                runs = np.minimum.accumulate(np.where(nodeStops, positions, self.size)[:, ::-1], axis=1)[:, ::-1]
+                runs = np.where(closed, positions, np.roll(runs, -1, axis=1))
+            else:
+                runs = np.maximum.accumulate(np.where(nodeStops, positions, -1), axis=1)
+                runs = np.where(closed, positions, np.roll(runs, 1, axis=1))
+            runs = rows * self.size + runs if horizontal else runs.T * self.size + columns
+            ends[:, index] = runs.ravel()[nodes]
+        self.graph = nodes, ends
+
+    def crawl(self, cell, direction):
+        """ Cell where moving from cell in direction stops: one lookup in the corridor graph, which is built on the
+        first crawl. Cells inside straight corridors and memory-mapped mazes, which can be larger than memory, walk to
+        the next node instead. """
+        if self.walls[cell] & direction:
+            return cell
+        if self.graph is None and isinstance(self.walls, bytearray):
+            self.corridors()
+        if self.graph is not None:
+            nodes, ends = self.graph
+            index = int(np.searchsorted(nodes, cell))
+            if index < len(nodes) and nodes[index] == cell:
+                return int(ends[index, direction.bit_length() - 1])
+        return self.walk(cell, direction)
+
+    def walk(self, cell, direction):
+        offset = {self.UP: -self.size, self.DOWN: self.size, self.LEFT: -1, self.RIGHT: 1}[direction]
+        if self.walls[cell] & direction:
+            return cell
+        cell += offset
+        while len(self.links(cell)) <= 2 and not self.walls[cell] & direction:
+            cell += offset
+        return cell
+
+    def carve(self, cell, direction, neighbor):
+        self.walls[cell] &= ~direction
+        self.walls[neighbor] &= ~self.OPPOSITE[direction]
+
+    def dfs(self):
+        visited = bytearray(len(self.walls))
+        stack = array.array("i", [0])
+        visited[0] = 1
+        while len(stack) > 0:
+            cell = stack[-1]
+            options = [(direction, neighbor) for direction, neighbor in self.neighbors(cell) if not visited[neighbor]]
+            if len(options) == 0:
+                stack.pop()
+                continue
+            direction, neighbor = self.random.choice(options)
+            self.carve(cell, direction, neighbor)
+            visited[neighbor] = 1
+            stack.append(neighbor)
+
+    def wilson(self):
+        # Loop-erased random walks: heading keeps the last direction a walk left every cell in, so loops erase
+        # themselves by being overwritten and the walk is retraced along the headings once it hits the tree.
+        inTree = bytearray(len(self.walls))
+        heading = bytearray(len(self.walls))
+        inTree[self.random.randrange(len(self.walls))] = 1
+        for first in range(len(self.walls)):
+            cell = first
+            while not inTree[cell]:
+                direction, neighbor = self.random.choice(list(self.neighbors(cell)))
+                heading[cell], cell = direction, neighbor
+            cell = first
+            while not inTree[cell]:
+                direction = heading[cell]
+                neighbor = next(neighbor for option, neighbor in self.neighbors(cell) if option == direction)
+                self.carve(cell, direction, neighbor)
+                inTree[cell], cell = 1, neighbor
+
+    def kruskal(self):
+        parents = array.array("i", range(len(self.walls)))
+
+        def find(cell):
+            while parents[cell] != cell:
+                parents[cell] = parents[parents[cell]]
+                cell = parents[cell]
+            return cell
+
+        # Edge 2 * cell joins the cell with its right neighbor, edge 2 * cell + 1 with the one below.
+        edges = np.arange(2 * len(self.walls), dtype=np.int32)
+        np.random.default_rng(self.random.randrange(2 ** 32)).shuffle(edges)
+        for offset in range(0, len(edges), 1 << 16):
+            for edge in edges[offset:offset + (1 << 16)].tolist():
+                cell, down = divmod(edge, 2)
+                row, column = divmod(cell, self.size)
+                if down and row < self.size - 1:
+                    direction, neighbor = self.DOWN, cell + self.size
+                elif not down and column < self.size - 1:
+                    direction, neighbor = self.RIGHT, cell + 1
+                else:
+                    continue
+                root, neighborRoot = find(cell), find(neighbor)
+                if root != neighborRoot:
+                    parents[root] = neighborRoot
+                    self.carve(cell, direction, neighbor)
+
+    def eller(self):
+        for row, walls in enumerate(Maze.ellerRows(self.size, self.size, self.random)):
+            self.walls[row * self.size:(row + 1) * self.size] = walls
+
+    @staticmethod
+    def ellerRows(rows, columns, rand):
+        """ Eller's algorithm: yields the wall bits of one row at a time while only keeping set labels for the
+        current row, so a maze of any height streams out in memory proportional to its width. """
+        labels = list(range(columns))
+        members = {label: [column] for column, label in enumerate(labels)}
+        nextLabel = columns
+        walls = bytearray([Maze.WALLS]) * columns
+        for row in range(rows):
+            last = row == rows - 1
+            for column in range(columns - 1):
+                label, rightLabel = labels[column], labels[column + 1]
+                if label != rightLabel and (last or rand.random() < 0.5):
+                    walls[column] &= ~Maze.RIGHT
+                    walls[column + 1] &= ~Maze.LEFT
+                    if len(members[label]) < len(members[rightLabel]):
+                        label, rightLabel = rightLabel, label
+                    for member in members.pop(rightLabel):
+                        labels[member] = label
+                        members[label].append(member)
+            below = bytearray([Maze.WALLS]) * columns
+            if not last:
+                nextLabels, nextMembers = [None] * columns, {}
+                for label, cells in members.items():
+                    openings = [column for column in cells if rand.random() < 0.5] or [rand.choice(cells)]
+                    for column in openings:
+                        walls[column] &= ~Maze.DOWN
+                        below[column] &= ~Maze.UP
+                        nextLabels[column] = label
+                        nextMembers.setdefault(label, []).append(column)
+                for column in range(columns):
+                    if nextLabels[column] is None:
+                        nextLabels[column] = nextLabel
+                        nextMembers[nextLabel] = [column]
+                        nextLabel += 1
+                labels, members = nextLabels, nextMembers
+            yield walls
+            walls = below
+
+    def distances(self, source):
+        """ Breadth-first distances from source to every cell as a flat array. Wide frontiers are expanded with array
+        operations over all four directions at once, while narrow ones, which dominate the long corridors of
+        depth-first mazes, are cheaper to expand cell by cell. """
+        walls = np.frombuffer(self.walls, dtype=np.uint8)
+        distances = np.full(len(walls), -1, dtype=np.int32)
+        view = memoryview(distances)
+        steps = ((self.UP, -self.size), (self.DOWN, self.size), (self.LEFT, -1), (self.RIGHT, 1))
+        distances[source] = 0
+        frontier, distance = [source], 0
+        while len(frontier) > 0:
+            distance += 1
+            if len(frontier) < 64:
+                following = []
+                for cell in (frontier.tolist() if isinstance(frontier, np.ndarray) else frontier):
+                    cellWalls = self.walls[cell]
+                    for direction, offset in steps:
+                        if not cellWalls & direction and view[cell + offset] < 0:
+                            view[cell + offset] = distance
+                            following.append(cell + offset)
+                frontier = following
             else:
-                return self
+                frontier = np.asarray(frontier)
+                cellWalls = walls[frontier]
+                frontier = np.concatenate([frontier[cellWalls & direction == 0] + offset for direction, offset in steps])
+                frontier = frontier[distances[frontier] < 0]
+                distances[frontier] = distance
+        return distances
+
+    def farthest(self, cell):
+        return int(np.argmax(self.distances(cell)))
+
+    def longest(self):
+        # In a tree the cell farthest from any cell is one end of a longest path, and the cell farthest from it the other.
+        start = self.farthest(0)
+        return start, self.farthest(start)
+
+    def hint(self, cell):
+        if not isinstance(self.walls, bytearray):
+            # A distance field of a memory-mapped maze could outgrow memory, follow a bounded search instead.
+            if cell not in self.route:
+                path = self.astar(cell, self.finish, self.hintLimit)
+                self.route = dict(zip(path, path[1:]))
+            return self.route.get(cell, cell)
+        if self.field is None:
+            self.field = self.distances(self.finish)
+        for link in self.links(cell):
+            if self.field[link] < self.field[cell]:
+                return link
+        return cell
+
+    def path(self, parents, cell):
+        path = [cell]
+        while parents[cell] != cell:
+            cell = parents[cell]
+            path.append(cell)
+        return path[::-1]
+
+    def solve(self, solver="bfs", start=None, finish=None):
+        start = self.start if start is None else start
+        finish = self.finish if finish is None else finish
+        return getattr(self, solver)(start, finish)
+
+    def bfs(self, start, finish):
+        parents = array.array("i", [-1]) * len(self.walls)
+        parents[start] = start
+        queue = collections.deque([start])
+        while len(queue) > 0:
+            cell = queue.popleft()
+            if cell == finish:
+                break
+            for link in self.links(cell):
+                if parents[link] < 0:
+                    parents[link] = cell
+                    queue.append(link)
+        return self.path(parents, finish)
+
+    def astar(self, start, finish, limit=None):
+        """ With a limit the parents are kept in a dictionary instead of an array over all cells, and an empty path is
+        returned once limit cells were expanded without reaching the finish. """
+        finishRow, finishColumn = divmod(finish, self.size)
+
+        def heuristic(cell):
+            row, column = divmod(cell, self.size)
+            return abs(row - finishRow) + abs(column - finishColumn)
+
+        # Every cell of a perfect maze has a single path to it, so the first time it is reached is the only one.
+        parents = array.array("i", [-1]) * len(self.walls) if limit is None else self.Parents()
+        parents[start] = start
+        queue = [(heuristic(start), 0, start)]
+        expanded = 0
+        while len(queue) > 0:
+            _, cost, cell = heapq.heappop(queue)
+            if cell == finish:
+                break
+            expanded += 1
+            if expanded == limit:
+                return []
+            for link in self.links(cell):
+                if parents[link] < 0:
+                    parents[link] = cell
+                    heapq.heappush(queue, (cost + 1 + heuristic(link), cost + 1, link))
+        return self.path(parents, finish)
+
+    def bidirectional(self, start, finish):
+        if start == finish:
+            return [start]
+        parents = [array.array("i", [-1]) * len(self.walls), array.array("i", [-1]) * len(self.walls)]
+        parents[0][start], parents[1][finish] = start, finish
+        frontiers = [[start], [finish]]
+        while len(frontiers[0]) > 0 and len(frontiers[1]) > 0:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            following = []
+            for cell in frontiers[side]:
+                for link in self.links(cell):
+                    if parents[side][link] < 0:
+                        parents[side][link] = cell
+                        if parents[1 - side][link] >= 0:
+                            return self.path(parents[0], link) + self.path(parents[1], link)[-2::-1]
+                        following.append(link)
+            frontiers[side] = following
+        return []
+
+    @classmethod
+    def benchmark(cls, sizes=(100, 500, 1000), algorithms=algorithms):
+        for size in sizes:
+            for algorithm in algorithms:
+                started = time.perf_counter()
+                cls(size, algorithm, seed=0)
+                elapsed = time.perf_counter() - started
+                tracemalloc.start()
+                cls(size, algorithm, seed=0)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print("{size}x{size} {algorithm}: {elapsed:.2f} s, {peak:.2f} MiB peak".format(
+                    size=size, algorithm=algorithm, elapsed=elapsed, peak=peak / 2 ** 20))
+
+    @classmethod
+    def benchmarkSolvers(cls, sizes=(100, 300, 1000), algorithm="kruskal"):
+        for size in sizes:
+            maze = cls(size, algorithm, seed=0)
+            started = time.perf_counter()
+            maze.hint(maze.start)
+            timings = ["distance field {:.1f} ms".format(1e3 * (time.perf_counter() - started))]
+            for solver in cls.solvers:
+                started = time.perf_counter()
+                path = maze.solve(solver)
+                timings.append("{} {:.1f} ms".format(solver, 1e3 * (time.perf_counter() - started)))
+            print("{size}x{size} ({length} steps): {timings}".format(
+                size=size, length=len(path) - 1, timings=", ".join(timings)))
+
+
+class QMaze(QWidget):
+    minimumPaintStep = 12
 
-    def __init__(self, size):
+    def __init__(self, size, algorithm="dfs", path=None, longest=False):
         super(QMaze, self).__init__()
         self.size = size
-        self.nodes = None
-        self.startNode = None
-        self.finishNode = None
-        self.playerNode = None
+        self.algorithm = algorithm
+        self.path = path
+        self.longest = longest
+        self.maze = None
+        self.playerCell = None
         self.paintStep = 0
-        self.paintOffset = 0
+        self.paintOffset = QPoint(0, 0)
+        self.paintCache = None
+        self._player = None
 
         self.initMaze()
         self.initUI()
@@ -53,140 +450,279 @@ class QMaze(QWidget):
 
     @player.setter
     def player(self, point):
+        # Animation frames only repaint where the ball was and where it is now, the maze itself comes from the cache.
+        if self._player is not None:
+            self.update(self.playerRect(self._player))
         self._player = point
-        self.update()
+        self.update(self.playerRect(point))
+
+    def playerRect(self, point):
+        radius = int(0.45 * self.paintStep) + 2
+        return QRect(point + self.paintOffset - QPoint(radius, radius), QSize(2 * radius + 1, 2 * radius + 1))
 
     def initMaze(self):
-        self.nodes = {}
-        for row in range(self.size):
-            for column in range(self.size):
-                self.nodes[row, column] = QMaze.Node(row, column)
-
-        for (row, column), node in self.nodes.items():
-            if 0 < row:
-                node.neighbors.append(self.nodes[row - 1, column])
-            if row < self.size - 1:
-                node.neighbors.append(self.nodes[row + 1, column])
-            if 0 < column:
-                node.neighbors.append(self.nodes[row, column - 1])
-            if column < self.size - 1:
-                node.neighbors.append(self.nodes[row, column + 1])
-
-        self.startNode = self.nodes[0, 0]
-        self.finishNode = self.generateMaze(self.startNode)
-        self.playerNode = self.startNode
-        self.player = self.playerNode.point(self)
-
-    def generateMaze(self, start):
-        generated = set()
-        deepest_node, deepest_recursion = None, -1
-
-        def generateNode(node, recursion=0):
-            nonlocal generated, deepest_node, deepest_recursion
-            if node in generated:
-                return
-            generated.add(node)
-            for neighbor in random.sample(node.neighbors, len(node.neighbors)):
-                if neighbor not in generated:
-                    node.links.append(neighbor)
-                    neighbor.links.append(node)
-                    generateNode(neighbor, recursion + 1)
-            if recursion > deepest_recursion:
-                deepest_node, deepest_recursion = node, recursion
-
-        generateNode(start)
-        return deepest_node
+        if self.path is not None:
+            self.maze = Maze.load(self.path)
+            self.size = self.maze.size
+        else:
+            self.maze = Maze(self.size, self.algorithm, longest=self.longest)
+        self.playerCell = self.maze.start
+        self.follow()
+        self.invalidate()
+        self.player = self.point(self.playerCell)
+
+    def point(self, cell):
+        row, column = divmod(cell, self.size)
+        return QPoint(int(column * self.paintStep), int(row * self.paintStep))
+
+    def follow(self, force=False):
+        # Mazes that do not fit the widget are shown around the player, recentered whenever it leaves the middle half.
+        if min(self.width(), self.height()) >= self.minimumPaintStep * self.size:
+            return
+        point = self.point(self.playerCell) + self.paintOffset
+        if force or not (self.width() // 4 <= point.x() <= 3 * self.width() // 4 and
+                         self.height() // 4 <= point.y() <= 3 * self.height() // 4):
+            self.paintOffset = QPoint(self.width() // 2, self.height() // 2) - self.point(self.playerCell)
+            self.invalidate()
+
+    def invalidate(self):
+        self.paintCache = None
+        self.update()
 
     def initUI(self):
         self.setWindowTitle(self.tr("Maze"))
 
     def mousePressEvent(self, mouseEvent):
-        closestNode = self.playerNode.closest(self, mouseEvent.pos() - self.paintOffset)
-        direction = closestNode.row - self.playerNode.row, closestNode.column - self.playerNode.column
-        crawlNode = self.playerNode.crawl(direction)
+        # The click in fractional cell units picks the closest link of the player, without any QPoint arithmetic.
+        row = (mouseEvent.y() - self.paintOffset.y()) / self.paintStep
+        column = (mouseEvent.x() - self.paintOffset.x()) / self.paintStep
+        links = self.maze.links(self.playerCell)
+        if len(links) > 0:
+            link = min(links, key=lambda link: abs(link // self.size - row) + abs(link % self.size - column))
+            self.movePlayer(self.maze.direction(self.playerCell, link))
+
+    def keyPressEvent(self, keyEvent):
+        if keyEvent.key() == Qt.Key_H:
+            hint = self.maze.hint(self.playerCell)
+            if hint != self.playerCell:
+                self.movePlayer(self.maze.direction(self.playerCell, hint))
+
+    def movePlayer(self, direction):
+        crawlCell = self.maze.crawl(self.playerCell, direction)
 
         self.animation = QPropertyAnimation(self, b"player")
-        if len(crawlNode.links) > 2:
+        if len(self.maze.links(crawlCell)) > 2:
             self.animation.setEasingCurve(QEasingCurve.OutBack);
         else:
             self.animation.setEasingCurve(QEasingCurve.OutBounce);
         self.animation.setStartValue(self.player)
-        self.animation.setEndValue(crawlNode.point(self))
+        self.animation.setEndValue(self.point(crawlCell))
         self.animation.setDuration(400)
         self.animation.start()
 
-        self.playerNode = crawlNode
-        if self.playerNode == self.finishNode:
+        self.playerCell = crawlCell
+        self.follow()
+        if self.playerCell == self.maze.finish:
             QMessageBox.information(self, self.tr("Victory!"), self.tr("You won :)"), QMessageBox.Ok)
             self.initMaze()
 
-    def paintEvent(self, paintEvent):
+    def paintMaze(self):
+        """ Renders the corridors, start and finish once into a pixmap that paint events copy from until the maze,
+        the widget size or the visible part of a large maze changes. """
+        self.paintCache = QPixmap(self.rect().size() * self.devicePixelRatioF())
+        self.paintCache.setDevicePixelRatio(self.devicePixelRatioF())
+        self.paintCache.fill(Qt.transparent)
+
         pen = QPen()
         pen.setJoinStyle(Qt.RoundJoin)
         pen.setCapStyle(Qt.RoundCap)
-        painter = QPainter(self)
+        painter = QPainter(self.paintCache)
         painter.translate(self.paintOffset)
         painter.setBackgroundMode(Qt.TransparentMode)
         painter.setRenderHint(QPainter.Antialiasing)
 
-        if self.nodes is not None:
-            painted = set()
+        color = self.palette().color(QPalette.Dark)
+        pen.setColor(color)
+        pen.setWidth(int(0.50 * self.paintStep))
+        painter.setPen(pen)
+        # Only the rows on screen are read, which keeps memory-mapped mazes paged out everywhere else.
+        path = QPainterPath()
+        top, left, bottom, right = self.window(self.rect())
+        for row, walls in enumerate(self.maze.grid[top:bottom, left:right].tolist(), top):
+            y = int(row * self.paintStep)
+            for column, cell in enumerate(walls, left):
+                x = int(column * self.paintStep)
+                if not cell & Maze.RIGHT:
+                    path.moveTo(x, y)
+                    path.lineTo(int((column + 1) * self.paintStep), y)
+                if not cell & Maze.DOWN:
+                    path.moveTo(x, y)
+                    path.lineTo(x, int((row + 1) * self.paintStep))
+        painter.drawPath(path)
 
-            def paintNode(node):
-                nonlocal painter, painted
-                if node in painted:
-                    return
-                painted.add(node)
-                for link in node.links:
-                    if link not in painted:
-                        painter.drawLine(node.point(self), link.point(self))
-                        paintNode(link)
+        pen.setWidth(int(0.75 * self.paintStep))
+        painter.setPen(pen)
+        painter.drawPoint(self.point(self.maze.start))
 
-            color = self.palette().color(QPalette.Dark)
-            pen.setColor(color)
-            pen.setWidth(0.50 * self.paintStep)
-            painter.setPen(pen)
-            for node in self.nodes.values():
-                if paintEvent.region().contains(node.point(self)):
-                    paintNode(node)
+        color = self.palette().color(QPalette.Dark).darker(120)
+        pen.setColor(color)
+        painter.setPen(pen)
+        painter.drawPoint(self.point(self.maze.finish))
 
-        if self.startNode is not None:
-            color = self.palette().color(QPalette.Dark)
-            pen.setColor(color)
-            pen.setWidth(0.75 * self.paintStep)
-            painter.setPen(pen)
-            if paintEvent.region().contains(self.startNode.point(self)):
-                painter.drawPoint(self.startNode.point(self))
+        del painter, pen
 
-        if self.finishNode is not None and paintEvent.region().contains(self.finishNode.point(self)):
-            color = self.palette().color(QPalette.Dark).darker(120)
-            pen.setColor(color)
-            pen.setWidth(0.75 * self.paintStep)
-            painter.setPen(pen)
-            painter.drawPoint(self.finishNode.point(self))
+    def paintEvent(self, paintEvent):
+        if self.paintCache is None:
+            self.paintMaze()
+
+        pen = QPen()
+        pen.setJoinStyle(Qt.RoundJoin)
+        pen.setCapStyle(Qt.RoundCap)
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.paintCache)
+        painter.translate(self.paintOffset)
+        painter.setBackgroundMode(Qt.TransparentMode)
+        painter.setRenderHint(QPainter.Antialiasing)
 
         if self.player is not None:
             color = self.palette().color(QPalette.Highlight)
             color.setAlpha(196)
             pen.setColor(color)
-            pen.setWidth(0.90 * self.paintStep)
+            pen.setWidth(int(0.90 * self.paintStep))
             painter.setPen(pen)
             painter.drawPoint(self.player)
 
         del painter, pen
 
+    def window(self, rect):
+        # Cells whose center lies within half a step of the rect, plus the row and column before for incoming links.
+        rect = rect.translated(-self.paintOffset)
+        top = max(int(rect.top() / self.paintStep) - 1, 0)
+        left = max(int(rect.left() / self.paintStep) - 1, 0)
+        bottom = min(int(rect.bottom() / self.paintStep) + 2, self.size)
+        right = min(int(rect.right() / self.paintStep) + 2, self.size)
+        return top, left, max(bottom, top), max(right, left)
+
     def resizeEvent(self, resizeEvent):
-        self.paintStep = min(self.width() / self.size, self.height() / self.size)
-        self.paintOffset = QPoint((self.paintStep + (self.width() - self.paintStep * self.size)) / 2,
-                                  (self.paintStep + (self.height() - self.paintStep * self.size)) / 2)
-        self.player = self.playerNode.point(self)
+        self.paintStep = max(min(self.width() / self.size, self.height() / self.size), self.minimumPaintStep)
+        self.paintOffset = QPoint(int(self.paintStep + (self.width() - self.paintStep * self.size)) // 2,
+                                  int(self.paintStep + (self.height() - self.paintStep * self.size)) // 2)
+        self.follow(force=True)
+        self.invalidate()
+        self.player = self.point(self.playerCell)
 
     def sizeHint(self):
         paintStepHint = 40
-        return QSize(self.size * paintStepHint, self.size * paintStepHint)
+        length = min(self.size * paintStepHint, 800)
+        return QSize(length, length)
+
+
+class TestMaze(unittest.TestCase):
+    def testPerfect(self):
+        for algorithm in Maze.algorithms:
+            maze = Maze(24, algorithm, seed=1)
+            grid = maze.grid
+            self.assertTrue(np.all(grid[0, :] & Maze.UP) and np.all(grid[-1, :] & Maze.DOWN))
+            self.assertTrue(np.all(grid[:, 0] & Maze.LEFT) and np.all(grid[:, -1] & Maze.RIGHT))
+            self.assertTrue(np.array_equal(grid[:-1, :] & Maze.DOWN > 0, grid[1:, :] & Maze.UP > 0))
+            self.assertTrue(np.array_equal(grid[:, :-1] & Maze.RIGHT > 0, grid[:, 1:] & Maze.LEFT > 0))
+
+            # A perfect maze is a spanning tree: connected with exactly one passage less than cells.
+            passages = np.count_nonzero(~grid[:-1, :] & Maze.DOWN) + np.count_nonzero(~grid[:, :-1] & Maze.RIGHT)
+            self.assertEqual(passages, 24 * 24 - 1)
+            reached, stack = {maze.start}, [maze.start]
+            while len(stack) > 0:
+                for link in maze.links(stack.pop()):
+                    if link not in reached:
+                        reached.add(link)
+                        stack.append(link)
+            self.assertEqual(len(reached), 24 * 24)
+
+    def testDeterministic(self):
+        for algorithm in Maze.algorithms:
+            self.assertEqual(Maze(16, algorithm, seed=3).walls, Maze(16, algorithm, seed=3).walls)
+
+    def testStream(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "maze.bin")
+            Maze.stream(path, 64, seed=7)
+            self.assertEqual(os.path.getsize(path), Maze.header.size + 64 * 64)
+            maze = Maze.load(path)
+            self.assertEqual(bytes(maze.walls), bytes(Maze(64, "eller", seed=7).walls))
+            self.assertEqual(maze.grid.shape, (64, 64))
+            self.assertEqual(sorted(maze.links(maze.finish)), sorted(Maze(64, "eller", seed=7).links(maze.finish)))
+            path = maze.solve()
+            cell, hints = path[5], path[:6]
+            while cell != maze.finish:
+                cell = maze.hint(cell)
+                hints.append(cell)
+            self.assertEqual(hints, path)
+            self.assertIsNone(maze.field)
+            off = next(cell for cell in range(64 * 64) if cell not in path)
+            self.assertEqual(maze.hint(off), maze.solve(start=off)[1])
+            self.assertEqual(maze.astar(maze.start, maze.finish, limit=10), [])
+            del maze
+
+    def testSolvers(self):
+        for algorithm in Maze.algorithms:
+            maze = Maze(40, algorithm, seed=2)
+            paths = [maze.solve(solver) for solver in Maze.solvers]
+            self.assertEqual(paths[0], paths[1])
+            self.assertEqual(paths[0], paths[2])
+            self.assertEqual((paths[0][0], paths[0][-1]), (maze.start, maze.finish))
+            self.assertTrue(all(b in maze.links(a) for a, b in zip(paths[0], paths[0][1:])))
+
+            distances = maze.distances(maze.finish)
+            self.assertEqual(distances[maze.start], len(paths[0]) - 1)
+            self.assertEqual(np.count_nonzero(distances < 0), 0)
+            cell, hints = maze.start, [maze.start]
+            while cell != maze.finish:
+                cell = maze.hint(cell)
+                hints.append(cell)
+            self.assertEqual(hints, paths[0])
+
+            start, finish = maze.longest()
+            self.assertEqual(maze.distances(start).max(), maze.distances(finish)[start])
+            self.assertLessEqual(max(maze.distances(cell).max() for cell in range(0, 40 * 40, 97)),
+                                 maze.distances(finish)[start])
+
+    def testCrawl(self):
+        for algorithm in Maze.algorithms:
+            maze = Maze(30, algorithm, seed=4)
+            self.assertIsNone(maze.graph)
+            for direction in Maze.DIRECTIONS:
+                self.assertEqual([maze.crawl(cell, direction) for cell in range(30 * 30)],
+                                 [maze.walk(cell, direction) for cell in range(30 * 30)])
+            nodes, ends = maze.graph
+            self.assertTrue(all(len(maze.links(cell)) != 2 or maze.direction(cell, maze.links(cell)[0]) !=
+                                Maze.OPPOSITE[maze.direction(cell, maze.links(cell)[1])] for cell in nodes.tolist()))
+            self.assertTrue(np.isin(ends, nodes).all())
+
+    def testLarge(self):
+        maze = Maze(300, "dfs", seed=0)
+        self.assertNotEqual(maze.start, maze.finish)
 
 
 if __name__ == "__main__":
-    application = QApplication(sys.argv)
-    qMaze = QMaze(10)
+    parser = argparse.ArgumentParser(description="Maze")
+    parser.add_argument("--size", type=int, default=10, help="number of cells per maze side")
+    parser.add_argument("--algorithm", choices=Maze.algorithms, default="dfs", help="maze generation algorithm")
+    parser.add_argument("--longest", action="store_true", help="place start and finish at the ends of the longest path")
+    parser.add_argument("--benchmark", action="store_true", help="measure generation time and peak memory")
+    parser.add_argument("--solvers", action="store_true", help="measure solver and distance field time")
+    parser.add_argument("--stream", metavar="PATH", help="write an Eller maze of the given size row by row to a file")
+    parser.add_argument("--file", metavar="PATH", help="play a memory-mapped maze file")
+    arguments, qtArguments = parser.parse_known_args()
+    if arguments.benchmark:
+        Maze.benchmark()
+        sys.exit(0)
+    if arguments.solvers:
+        Maze.benchmarkSolvers()
+        sys.exit(0)
+    if arguments.stream:
+        Maze.stream(arguments.stream, arguments.size)
+        sys.exit(0)
+
+    application = QApplication(sys.argv[:1] + qtArguments)
+    qMaze = QMaze(arguments.size, arguments.algorithm, arguments.file, arguments.longest)
     sys.exit(application.exec_())
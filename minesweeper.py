@@ -1,18 +1,42 @@
-from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QMessageBox, QGridLayout, QSizePolicy
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtWidgets import QApplication, QAbstractScrollArea, QFrame, QMessageBox
+from PyQt5.QtCore import Qt, QSize, QPoint, QRect
+from PyQt5.QtGui import QPainter, QPalette
+import numpy as np
+import collections
+import fractions
+import math
 import random
+from unittest import mock
+import unittest
+import argparse
 import sys
 
 
 class MineSweeper:
     class Tile:
-        def __init__(self, row, column):
+        def __init__(self, mineSweeper, row, column):
+            self.mineSweeper = mineSweeper
             self.row, self.column = row, column
-            self.explosive = False
-            self.delegate = None
-            self.revealed = False
-            self.marked = False
-            self.bombs = None
+
+        @property
+        def explosive(self):
+            return bool(self.mineSweeper.mines[self.row, self.column])
+
+        @property
+        def bombs(self):
+            return int(self.mineSweeper.counts[self.row, self.column])
+
+        @property
+        def revealed(self):
+            return bool(self.mineSweeper.revealed[self.row, self.column])
+
+        @property
+        def marked(self):
+            return bool(self.mineSweeper.marked[self.row, self.column])
+
+        @marked.setter
+        def marked(self, marked):
+            self.mineSweeper.marked[self.row, self.column] = marked
 
         def __str__(self):
             if self.revealed and self.explosive:
@@ -30,18 +54,12 @@ class MineSweeper:
         def reveal(self, mineSweeper, ignoreRecursive=False, ignoreMarked=False):
             if self.marked and not ignoreMarked:
                 return
-            self.revealed = True
-            self.notify()
-            if self.explosive:
-                return
-            if self.bombs == 0 and not ignoreRecursive:
-                for neighbor in self.neighbors(mineSweeper):
-                    if not neighbor.explosive and not neighbor.revealed:
-                        neighbor.reveal(mineSweeper)
+            if mineSweeper.fresh:
+                mineSweeper.start(self.row, self.column)
+            mineSweeper.notify(mineSweeper.flood(self.row, self.column, not ignoreRecursive))
 
         def notify(self):
-            if self.delegate is not None:
-                self.delegate.updateEvent(self)
+            self.mineSweeper.notify([(self.row, self.column)])
 
         def neighbors(self, mineSweeper):
             for diffRow, diffCol in [(+1, -1), (+1, 0), (+1, +1),
@@ -51,38 +69,72 @@ class MineSweeper:
                 if (neighborRow, neighborCol) in mineSweeper:
                     yield mineSweeper[(neighborRow, neighborCol)]
 
-        def reset(self):
-            self.explosive = False
-            self.revealed = False
-            self.marked = False
-            self.bombs = None
-            self.notify()
-
-        def count(self, mineSweeper):
-            self.bombs = 0
-            for neighbor in self.neighbors(mineSweeper):
-                self.bombs += int(neighbor.explosive)
-
-    def __init__(self, size, explosiveness):
+    def __init__(self, size, explosiveness, noGuess=False):
         self.explosiveness = explosiveness
+        self.noGuess = noGuess
+        self.fresh = True
         self.size = size
         self.field = {}
-        for row in range(self.size):
-            for column in range(self.size):
-                tile = MineSweeper.Tile(row, column)
-                tile.explosive = random.random() <= self.explosiveness
-                self.field[row, column] = tile
-        for tile in self:
-            tile.count(self)
+        self.delegate = None
+        self.hidden = 0
+        self.exploded = 0
+        self.mines = np.zeros(shape=(self.size, self.size), dtype=bool)
+        self.counts = np.zeros(shape=(self.size, self.size), dtype=np.uint8)
+        self.revealed = np.zeros(shape=(self.size, self.size), dtype=bool)
+        self.marked = np.zeros(shape=(self.size, self.size), dtype=bool)
+        self.generate()
 
     def __contains__(self, row_column):
-        return row_column in self.field
+        row, column = row_column
+        return 0 <= row < self.size and 0 <= column < self.size
 
     def __getitem__(self, row_column):
-        return self.field[row_column]
+        tile = self.field.get(row_column)
+        if tile is None:
+            if row_column not in self:
+                raise KeyError(row_column)
+            tile = MineSweeper.Tile(self, *row_column)
+            self.field[row_column] = tile
+        return tile
 
     def __iter__(self):
-        return self.field.values().__iter__()
+        for row in range(self.size):
+            for column in range(self.size):
+                yield self[row, column]
+
+    @staticmethod
+    def neighborhood(array):
+        padded = np.pad(array.astype(np.uint8), 1)
+        return padded[  :-2, :-2] + padded[  :-2, 1:-1] + padded[  :-2, 2:] + \
+               padded[1:-1, :-2]                        + padded[1:-1, 2:] + \
+               padded[2:  , :-2] + padded[2:  , 1:-1] + padded[2:  , 2:]
+
+    def generate(self, safe=None):
+        self.fresh = safe is None
+        self.mines[:, :] = np.random.random(size=self.mines.shape) <= self.explosiveness
+        if safe is not None:
+            row, column = safe
+            self.mines[max(row - 1, 0):row + 2, max(column - 1, 0):column + 2] = False
+        self.count()
+
+    def start(self, row, column, attempts=1000):
+        """ Make sure that the first revealed tile opens a region. With noGuess set, boards are also redrawn until
+        MineSolver can clear them from that tile without guessing. Returns the number of boards drawn. """
+        if not self.noGuess:
+            if self.mines[row, column] or self.counts[row, column] > 0:
+                self.generate((row, column))
+            self.fresh = False
+            return 1
+        for attempt in range(1, attempts + 1):
+            self.generate((row, column))
+            if MineSolver(self).solve(row, column):
+                break
+        return attempt
+
+    def count(self):
+        self.counts[:, :] = self.neighborhood(self.mines)
+        self.hidden = np.count_nonzero(~self.mines & ~self.revealed)
+        self.exploded = np.count_nonzero(self.mines & self.revealed)
 
     def __str__(self):
         string = ""
@@ -92,76 +144,594 @@ class MineSweeper:
             string += "\n"
         return string
 
+    def flood(self, row, column, recursive=True):
+        # Breadth first reveal of the zero count region around the tile, marked and explosive tiles stop the fill.
+        # Returns the positions of all newly revealed tiles so that they can be reported as one batch.
+        if self.revealed[row, column]:
+            return []
+        self.revealed[row, column] = True
+        changed = [(row, column)]
+        if self.mines[row, column]:
+            self.exploded += 1
+            return changed
+        self.hidden -= 1
+        if not recursive or self.counts[row, column] > 0:
+            return changed
+        revealed, mines, marked, counts = self.revealed, self.mines, self.marked, self.counts
+        queue = collections.deque(changed)
+        while len(queue) > 0:
+            row, column = queue.popleft()
+            for neighborRow in range(max(row - 1, 0), min(row + 2, self.size)):
+                for neighborCol in range(max(column - 1, 0), min(column + 2, self.size)):
+                    if revealed[neighborRow, neighborCol] or mines[neighborRow, neighborCol] or \
+                       marked[neighborRow, neighborCol]:
+                        continue
+                    revealed[neighborRow, neighborCol] = True
+                    changed.append((neighborRow, neighborCol))
+                    if counts[neighborRow, neighborCol] == 0:
+                        queue.append((neighborRow, neighborCol))
+        self.hidden -= len(changed) - 1
+        return changed
+
+    def notify(self, changed=None):
+        if self.delegate is not None:
+            self.delegate.updateEvent(changed)
+
     def score(self):
-        notRevealedTilesCount = 0
-        for tile in self:
-            if not tile.revealed and not tile.explosive:
-                notRevealedTilesCount += 1
-            if tile.revealed and tile.explosive:
-                return -1
-        if notRevealedTilesCount == 0:
+        if self.exploded > 0:
+            return -1
+        if self.hidden == 0:
             return 1
         return None
 
     def reveal(self):
-        for tile in self:
-            if tile.explosive:
-                tile.reveal(self, True, True)
+        changed = np.argwhere(self.mines & ~self.revealed)
+        self.revealed |= self.mines
+        self.exploded += len(changed)
+        self.notify([(row, column) for row, column in changed.tolist()])
+
+    def window(self, top, left, bottom, right):
+        window = np.s_[top:bottom, left:right]
+        return self.mines[window], self.counts[window], self.revealed[window], self.marked[window]
 
     def reset(self):
-        for tile in self:
-            tile.reset()
-            tile.explosive = random.random() <= self.explosiveness
-        for tile in self:
-            tile.count(self)
+        self.revealed[:, :] = False
+        self.marked[:, :] = False
+        self.generate()
+        self.notify()
 
+    @classmethod
+    def benchmark(cls, sizes=(10, 100, 1000, 2000), clicks=1000):
+        import time
+        for size in sizes:
+            mineSweeper = cls(size, 0.2)
+            # The first click redraws the board around it, so the click targets are picked afterwards.
+            mineSweeper[size // 2, size // 2].reveal(mineSweeper)
+            safe = ~mineSweeper.mines & ~mineSweeper.revealed
+            for kind, tiles in (("numbered", safe & (mineSweeper.counts > 0)), ("zero", safe & (mineSweeper.counts == 0))):
+                tiles = np.argwhere(tiles)
+                tiles = tiles[np.random.permutation(len(tiles))].tolist()
+                done, hidden = 0, mineSweeper.hidden
+                start = time.perf_counter()
+                for row, column in tiles:
+                    if done == clicks:
+                        break
+                    # Zero tiles opened by an earlier flood would only measure the early return.
+                    if mineSweeper.revealed[row, column]:
+                        continue
+                    mineSweeper[row, column].reveal(mineSweeper)
+                    mineSweeper.score()
+                    done += 1
+                elapsed = time.perf_counter() - start
+                if done > 0:
+                    print("{size}x{size}: {latency:.1f} us per {kind} click, {tiles:.1f} tiles revealed".format(
+                        size=size, kind=kind, latency=1e6 * elapsed / done, tiles=(hidden - mineSweeper.hidden) / done))
 
-class QMineSweeper(QWidget):
-    class QTileButton(QPushButton):
-        def __init__(self):
-            super(QMineSweeper.QTileButton, self).__init__()
-            self.setFocusPolicy(Qt.NoFocus)
-            self.setContextMenuPolicy(Qt.CustomContextMenu)
-            self.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.MinimumExpanding)
 
-        def clickEvent(self, tile):
-            self.parent().reveal(tile)
+class InfiniteMineSweeper:
+    """ Endless Minesweeper world split into square chunks. Mines of a chunk are drawn from a generator seeded with the
+    world seed and the chunk coordinates, so any chunk can be dropped and regenerated identically later. Chunks that
+    were never revealed or marked are evicted in least recently used order once they are out of the viewport. """
+    class Chunk:
+        def __init__(self, mines, counts):
+            self.mines, self.counts = mines, counts
+            self.revealed = np.zeros(shape=mines.shape, dtype=bool)
+            self.marked = np.zeros(shape=mines.shape, dtype=bool)
+            self.touched = False
 
-        def menuEvent(self, tile):
-            tile.mark()
+    class Layer:
+        def __init__(self, world, name):
+            self.world, self.name = world, name
+
+        def __getitem__(self, row_column):
+            chunk, row, column = self.world.locate(*row_column)
+            return getattr(chunk, self.name)[row, column]
+
+        def __setitem__(self, row_column, value):
+            chunk, row, column = self.world.locate(*row_column)
+            getattr(chunk, self.name)[row, column] = value
+            chunk.touched = True
+
+    def __init__(self, explosiveness=0.15, seed=None, chunkSize=32, capacity=256):
+        self.explosiveness = explosiveness
+        self.chunkSize = chunkSize
+        self.capacity = capacity
+        self.size = None
+        self.noGuess = False
+        self.field = {}
+        self.delegate = None
+        self.viewport = (0, 0, 0, 0)
+        self.chunks = collections.OrderedDict()
+        self.mines, self.counts = self.Layer(self, "mines"), self.Layer(self, "counts")
+        self.revealed, self.marked = self.Layer(self, "revealed"), self.Layer(self, "marked")
+        self.generate(seed)
+
+    def __contains__(self, row_column):
+        return True
+
+    def __getitem__(self, row_column):
+        tile = self.field.get(row_column)
+        if tile is None:
+            tile = MineSweeper.Tile(self, *row_column)
+            self.field[row_column] = tile
+        return tile
+
+    def generate(self, seed=None, safe=None):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.fresh = safe is None
+        self.opening = safe
+        self.exploded = 0
+        self.field.clear()
+        self.chunks.clear()
+
+    def start(self, row, column):
+        # Redrawing around the first click drops every chunk, marks placed before it are carried over.
+        marks = [(chunkRow * self.chunkSize + markRow, chunkColumn * self.chunkSize + markColumn)
+                 for (chunkRow, chunkColumn), chunk in self.chunks.items()
+                 for markRow, markColumn in np.argwhere(chunk.marked).tolist()]
+        self.generate(self.seed, (row, column))
+        for mark in marks:
+            self.marked[mark] = True
+        return 1
+
+    def draw(self, chunkRow, chunkColumn):
+        # Seed sequences only take non-negative entropy, hence the zigzag encoding of the chunk coordinates.
+        entropy = [self.seed, 2 * chunkRow if chunkRow >= 0 else -2 * chunkRow - 1,
+                   2 * chunkColumn if chunkColumn >= 0 else -2 * chunkColumn - 1]
+        generator = np.random.default_rng(entropy)
+        mines = generator.random(size=(self.chunkSize, self.chunkSize)) <= self.explosiveness
+        if self.opening is not None:
+            row, column = self.opening[0] - chunkRow * self.chunkSize, self.opening[1] - chunkColumn * self.chunkSize
+            mines[max(row - 1, 0):max(row + 2, 0), max(column - 1, 0):max(column + 2, 0)] = False
+        return mines
+
+    def chunk(self, chunkRow, chunkColumn):
+        key = chunkRow, chunkColumn
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        size = self.chunkSize
+        block = np.block([[self.draw(chunkRow + diffRow, chunkColumn + diffCol) for diffCol in (-1, 0, +1)]
+                          for diffRow in (-1, 0, +1)])
+        counts = MineSweeper.neighborhood(block[size - 1:2 * size + 1, size - 1:2 * size + 1])[1:-1, 1:-1]
+        chunk = self.Chunk(block[size:2 * size, size:2 * size].copy(), counts)
+        self.chunks[key] = chunk
+        self.evict(key)
+        return chunk
+
+    def evict(self, keep=None):
+        # The chunk being handed out is kept, it's still untouched until the caller writes to it.
+        if len(self.chunks) <= self.capacity:
+            return
+        top, left, bottom, right = (edge // self.chunkSize for edge in self.viewport)
+        for (chunkRow, chunkColumn), chunk in list(self.chunks.items()):
+            if len(self.chunks) <= self.capacity:
+                break
+            visible = top - 1 <= chunkRow <= bottom + 1 and left - 1 <= chunkColumn <= right + 1
+            if not chunk.touched and not visible and (chunkRow, chunkColumn) != keep:
+                del self.chunks[chunkRow, chunkColumn]
+
+    def locate(self, row, column):
+        chunkRow, row = divmod(row, self.chunkSize)
+        chunkColumn, column = divmod(column, self.chunkSize)
+        return self.chunk(chunkRow, chunkColumn), row, column
+
+    def window(self, top, left, bottom, right):
+        self.viewport = top, left, bottom, right
+        layers = [np.zeros(shape=(bottom - top, right - left), dtype=dtype)
+                  for dtype in (bool, np.uint8, bool, bool)]
+        size = self.chunkSize
+        for chunkRow in range(top // size, (bottom - 1) // size + 1):
+            for chunkColumn in range(left // size, (right - 1) // size + 1):
+                chunk = self.chunk(chunkRow, chunkColumn)
+                rowStart, columnStart = max(top, chunkRow * size), max(left, chunkColumn * size)
+                rowEnd, columnEnd = min(bottom, (chunkRow + 1) * size), min(right, (chunkColumn + 1) * size)
+                target = np.s_[rowStart - top:rowEnd - top, columnStart - left:columnEnd - left]
+                source = np.s_[rowStart - chunkRow * size:rowEnd - chunkRow * size,
+                               columnStart - chunkColumn * size:columnEnd - chunkColumn * size]
+                for layer, name in zip(layers, ("mines", "counts", "revealed", "marked")):
+                    layer[target] = getattr(chunk, name)[source]
+        return layers
+
+    def flood(self, row, column, recursive=True, limit=1000000):
+        chunk, chunkRow, chunkColumn = self.locate(row, column)
+        if chunk.revealed[chunkRow, chunkColumn]:
+            return []
+        chunk.revealed[chunkRow, chunkColumn] = chunk.touched = True
+        changed = [(row, column)]
+        if chunk.mines[chunkRow, chunkColumn]:
+            self.exploded += 1
+            return changed
+        if not recursive or chunk.counts[chunkRow, chunkColumn] > 0:
+            return changed
+        queue = collections.deque(changed)
+        while len(queue) > 0 and len(changed) < limit:
+            row, column = queue.popleft()
+            for neighborRow in range(row - 1, row + 2):
+                for neighborCol in range(column - 1, column + 2):
+                    chunk, chunkRow, chunkColumn = self.locate(neighborRow, neighborCol)
+                    if chunk.revealed[chunkRow, chunkColumn] or chunk.mines[chunkRow, chunkColumn] or \
+                       chunk.marked[chunkRow, chunkColumn]:
+                        continue
+                    chunk.revealed[chunkRow, chunkColumn] = chunk.touched = True
+                    changed.append((neighborRow, neighborCol))
+                    if chunk.counts[chunkRow, chunkColumn] == 0:
+                        queue.append((neighborRow, neighborCol))
+        return changed
+
+    def notify(self, changed=None):
+        if self.delegate is not None:
+            self.delegate.updateEvent(changed)
+
+    def score(self):
+        return -1 if self.exploded > 0 else None
 
-        def resizeEvent(self, resizeEvent):
-            font = self.font()
-            font.setBold(True)
-            font.setPixelSize(0.50 * min(self.width(), self.height()))
-            self.setFont(font)
+    def reveal(self):
+        changed = []
+        for (chunkRow, chunkColumn), chunk in self.chunks.items():
+            if chunk.touched:
+                for row, column in np.argwhere(chunk.mines & ~chunk.revealed).tolist():
+                    changed.append((chunkRow * self.chunkSize + row, chunkColumn * self.chunkSize + column))
+                chunk.revealed |= chunk.mines
+        self.exploded += len(changed)
+        self.notify(changed)
+
+    def reset(self):
+        self.generate()
+        self.notify()
+
+
+class MineSolver:
+    """ Minesweeper solver that only looks at what a player sees: revealed counts and the total number of mines.
+    Every step first applies single constraint rules and subset reasoning on the frontier, and only when these
+    get stuck it enumerates each independent frontier component exactly to get per-tile mine probabilities. """
+    componentLimit = 32
+
+    def __init__(self, mineSweeper):
+        self.mineSweeper = mineSweeper
+        self.total = int(np.count_nonzero(mineSweeper.mines))
+        self.flagged = np.zeros(shape=mineSweeper.mines.shape, dtype=bool)
+        self.cache = {}
+        self.exact = True
+
+    def constraints(self):
+        # One (unknown neighbor tiles, mines among them) pair for each revealed tile next to unknown tiles.
+        unknown = ~self.mineSweeper.revealed & ~self.flagged
+        frontier = self.mineSweeper.revealed & (MineSweeper.neighborhood(unknown) > 0)
+        flagged = MineSweeper.neighborhood(self.flagged)
+        size, constraints = self.mineSweeper.size, set()
+        for row, column in np.argwhere(frontier).tolist():
+            cells = frozenset((neighborRow, neighborCol)
+                              for neighborRow in range(max(row - 1, 0), min(row + 2, size))
+                              for neighborCol in range(max(column - 1, 0), min(column + 2, size))
+                              if unknown[neighborRow, neighborCol])
+            constraints.add((cells, int(self.mineSweeper.counts[row, column]) - int(flagged[row, column])))
+        return constraints
+
+    def deduce(self, constraints, rounds=3):
+        safe, mines = set(), set()
+        for _ in range(rounds):
+            for cells, count in constraints:
+                if count == 0:
+                    safe |= cells
+                elif count == len(cells):
+                    mines |= cells
+            if len(safe) > 0 or len(mines) > 0:
+                break
+            byCell = collections.defaultdict(list)
+            for constraint in constraints:
+                for cell in constraint[0]:
+                    byCell[cell].append(constraint)
+            derived = set()
+            for cells, count in constraints:
+                for other in byCell[next(iter(cells))]:
+                    if cells < other[0]:
+                        derived.add((other[0] - cells, other[1] - count))
+            if derived <= constraints:
+                break
+            constraints = constraints | derived
+        return safe, mines
+
+    def solutions(self, cells, constraints):
+        # Counts the solutions of one component grouped by their number of mines, together with how many of those
+        # solutions put a mine on every tile. Components recur across steps, hence the memoization.
+        key = frozenset(constraints)
+        if key in self.cache:
+            return self.cache[key]
+        index = {cell: idx for idx, cell in enumerate(cells)}
+        needs = [count for _, count in constraints]
+        unassigned = [len(constraint) for constraint, _ in constraints]
+        touching = [[] for _ in cells]
+        for idx, (constraint, _) in enumerate(constraints):
+            for cell in constraint:
+                touching[index[cell]].append(idx)
+        assignment, counted = [0] * len(cells), {}
+
+        def assign(position, mines):
+            if position == len(cells):
+                ways, hits = counted.setdefault(mines, [0, [0] * len(cells)])
+                counted[mines][0] = ways + 1
+                for idx, value in enumerate(assignment):
+                    hits[idx] += value
+                return
+            for value in (0, 1):
+                if all(0 <= needs[idx] - value <= unassigned[idx] - 1 for idx in touching[position]):
+                    for idx in touching[position]:
+                        needs[idx] -= value
+                        unassigned[idx] -= 1
+                    assignment[position] = value
+                    assign(position + 1, mines + value)
+                    for idx in touching[position]:
+                        needs[idx] += value
+                        unassigned[idx] += 1
+            assignment[position] = 0
+
+        assign(0, 0)
+        self.cache[key] = counted
+        return counted
+
+    def components(self, constraints):
+        parent = {}
+
+        def find(cell):
+            while parent.setdefault(cell, cell) != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        for cells, _ in constraints:
+            first = find(next(iter(cells)))
+            for cell in cells:
+                parent[find(cell)] = first
+        groups = collections.defaultdict(lambda: (set(), []))
+        for constraint in constraints:
+            group = groups[find(next(iter(constraint[0])))]
+            group[0].update(constraint[0])
+            group[1].append(constraint)
+        return [(sorted(cells), constraints) for cells, constraints in groups.values()]
+
+    def probabilities(self, constraints=None):
+        """ Return a dict that maps frontier tiles to their mine probability and the probability shared by all unknown
+        tiles outside the frontier. Probabilities are exact fractions unless a component has more than componentLimit
+        tiles, in which case its tiles fall back to local densities and self.exact is cleared. """
+        if constraints is None:
+            constraints = self.constraints()
+        unknown = ~self.mineSweeper.revealed & ~self.flagged
+        remaining = self.total - int(np.count_nonzero(self.flagged))
+        exact, approximate = [], {}
+        for cells, group in self.components(constraints):
+            if len(cells) > self.componentLimit:
+                for constraint, count in group:
+                    for cell in constraint:
+                        approximate[cell] = max(approximate.get(cell, 0), count / len(constraint))
+            else:
+                exact.append((cells, self.solutions(cells, group)))
+        outside = int(np.count_nonzero(unknown)) - sum(len(cells) for cells, _ in exact) - len(approximate)
+        self.exact = len(approximate) == 0
+
+        def convolve(distributions):
+            total = {0: 1}
+            for distribution in distributions:
+                combined = collections.defaultdict(int)
+                for mines, ways in total.items():
+                    for more, (moreWays, _) in distribution.items():
+                        combined[mines + more] += ways * moreWays
+                total = combined
+            return total
+
+        def weight(mines):
+            free = remaining - mines - round(sum(approximate.values()))
+            return math.comb(outside, free) if 0 <= free <= outside else 0
+
+        everything = convolve(solutions for _, solutions in exact)
+        normalization = sum(ways * weight(mines) for mines, ways in everything.items())
+        if normalization == 0:
+            self.exact = False
+            return dict(approximate), remaining / max(int(np.count_nonzero(unknown)), 1)
+        probabilities = dict(approximate)
+        for position, (cells, solutions) in enumerate(exact):
+            others = convolve(other for idx, (_, other) in enumerate(exact) if idx != position)
+            hits = [0] * len(cells)
+            for mines, (_, cellHits) in solutions.items():
+                factor = sum(ways * weight(mines + otherMines) for otherMines, ways in others.items())
+                for idx, cellHit in enumerate(cellHits):
+                    hits[idx] += cellHit * factor
+            for cell, hit in zip(cells, hits):
+                probabilities[cell] = fractions.Fraction(hit, normalization)
+        outsideMines = sum(ways * weight(mines) * (remaining - mines - round(sum(approximate.values())))
+                           for mines, ways in everything.items())
+        outsideProbability = fractions.Fraction(outsideMines, normalization * outside) if outside > 0 else 0
+        return probabilities, outsideProbability
+
+    def step(self):
+        """ Return sets of tiles that are certainly safe and certainly explosive given the revealed tiles.
+        Explosive tiles are remembered as flagged, so repeated calls keep narrowing the frontier down. """
+        safe, mines = set(), set()
+        while len(safe) == 0:
+            constraints = self.constraints()
+            newSafe, newMines = self.deduce(constraints)
+            if len(newSafe) == 0 and len(newMines) == 0:
+                probabilities, outsideProbability = self.probabilities(constraints)
+                newSafe = {cell for cell, probability in probabilities.items() if probability == 0}
+                newMines = {cell for cell, probability in probabilities.items() if probability == 1}
+                if self.exact and outsideProbability in (0, 1):
+                    frontier = set(probabilities)
+                    outside = np.argwhere(~self.mineSweeper.revealed & ~self.flagged).tolist()
+                    outside = {tuple(cell) for cell in outside} - frontier
+                    (newSafe if outsideProbability == 0 else newMines).update(outside)
+            if len(newSafe) == 0 and len(newMines) == 0:
+                break
+            for row, column in newMines:
+                self.flagged[row, column] = True
+            safe |= newSafe
+            mines |= newMines
+        return safe, mines
+
+    def solve(self, row, column):
+        """ Play the board from the given opening using certain moves only and tell whether it got cleared.
+        The board is left unrevealed afterwards. """
+        mineSweeper = self.mineSweeper
+        mineSweeper.flood(row, column)
+        while mineSweeper.hidden > 0 and mineSweeper.exploded == 0:
+            safe, _ = self.step()
+            if len(safe) == 0:
+                break
+            for row, column in safe:
+                mineSweeper.flood(row, column)
+        solved = mineSweeper.hidden == 0 and mineSweeper.exploded == 0
+        mineSweeper.revealed[:, :] = False
+        mineSweeper.count()
+        self.flagged[:, :] = False
+        return solved
+
+    @classmethod
+    def benchmark(cls, size=22, explosiveness=0.2, boards=20):
+        import time
+        steps, stepTime, attempts, unsolved = 0, 0, 0, 0
+        start = time.perf_counter()
+        for _ in range(boards):
+            mineSweeper = MineSweeper(size, explosiveness, noGuess=True)
+            center = size // 2, size // 2
+            attempts += mineSweeper.start(*center)
+            solver = cls(mineSweeper)
+            mineSweeper.flood(*center)
+            while mineSweeper.hidden > 0:
+                stepStart = time.perf_counter()
+                safe, _ = solver.step()
+                stepTime += time.perf_counter() - stepStart
+                steps += 1
+                if len(safe) == 0:
+                    # Generation gave up on finding a no-guess board, the solver is stuck on a guess
+                    unsolved += 1
+                    break
+                for row, column in safe:
+                    mineSweeper.flood(row, column)
+        elapsed = time.perf_counter() - start
+        print("{boards} no-guess {size}x{size} boards in {elapsed:.2f}s ({rate:.1f} boards/s, {attempts:.1f} attempts "
+              "per board, {unsolved} unsolved), {step:.2f} ms per deduction step".format(
+               boards=boards, size=size, elapsed=elapsed, rate=boards / elapsed, attempts=attempts / boards,
+               unsolved=unsolved, step=1000 * stepTime / max(steps, 1)))
+        return unsolved
 
-        def updateEvent(self, tile):
-            self.setEnabled(not tile.revealed)
-            self.setText(str(tile))
 
-        def sizeHint(self):
-            return QSize(35, 35)
+class QMineSweeper(QAbstractScrollArea):
+    tileSize = 32
+    infiniteExtent = 2 ** 24
 
-    def __init__(self, size):
+    def __init__(self, size, noGuess=False):
         super(QMineSweeper, self).__init__()
         self.size = size
-        self.mineSweeper = MineSweeper(self.size, 0.1)
+        if self.size is None:
+            self.mineSweeper = InfiniteMineSweeper()
+        else:
+            self.mineSweeper = MineSweeper(self.size, 0.1, noGuess)
+        self.mineSweeper.delegate = self
         self.initUI()
         self.show()
 
     def initUI(self):
         self.setWindowTitle(self.tr("Minesweeper"))
-        layout = QGridLayout()
-        layout.setSpacing(11)
-        self.setLayout(layout)
+        self.setFrameStyle(QFrame.NoFrame)
+        font = self.font()
+        font.setBold(True)
+        font.setPixelSize(int(0.50 * self.tileSize))
+        self.setFont(font)
+        self.horizontalScrollBar().setSingleStep(self.tileSize)
+        self.verticalScrollBar().setSingleStep(self.tileSize)
 
-        for tile in self.mineSweeper:
-            button = QMineSweeper.QTileButton()
-            self.layout().addWidget(button, tile.row, tile.column)
-            button.clicked.connect(lambda _, button=button, tile=tile: button.clickEvent(tile))
-            button.customContextMenuRequested.connect(lambda _, button=button, tile=tile: button.menuEvent(tile))
-            tile.delegate = button
+    def offset(self):
+        return QPoint(self.horizontalScrollBar().value(), self.verticalScrollBar().value())
+
+    def tileRect(self, row, column):
+        return QRect(column * self.tileSize, row * self.tileSize, self.tileSize, self.tileSize).translated(-self.offset())
+
+    def updateEvent(self, changed):
+        if changed is None or len(changed) == 0:
+            self.viewport().update()
+            return
+        rows, columns = [row for row, _ in changed], [column for _, column in changed]
+        topLeft = self.tileRect(min(rows), min(columns))
+        bottomRight = self.tileRect(max(rows), max(columns))
+        self.viewport().update(topLeft.united(bottomRight))
+
+    def paintEvent(self, paintEvent):
+        rect = paintEvent.rect().translated(self.offset())
+        top, left = rect.top() // self.tileSize, rect.left() // self.tileSize
+        bottom, right = rect.bottom() // self.tileSize + 1, rect.right() // self.tileSize + 1
+        if self.size is not None:
+            top, left = max(top, 0), max(left, 0)
+            bottom, right = min(bottom, self.size), min(right, self.size)
+        window = self.mineSweeper.window(top, left, max(bottom, top), max(right, left))
+        mines, counts, revealed, marked = (layer.tolist() for layer in window)
+
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(paintEvent.rect(), palette.color(QPalette.Window))
+        hiddenBrush, revealedBrush = palette.brush(QPalette.Button), palette.brush(QPalette.Base)
+        painter.setPen(palette.color(QPalette.Mid))
+        for row in range(bottom - top):
+            for column in range(right - left):
+                tileRect = self.tileRect(top + row, left + column).adjusted(1, 1, -1, -1)
+                painter.setBrush(revealedBrush if revealed[row][column] else hiddenBrush)
+                painter.drawRect(tileRect)
+                if revealed[row][column] and mines[row][column]:
+                    text = "☀"
+                elif revealed[row][column] and counts[row][column] > 0:
+                    text = str(counts[row][column])
+                elif not revealed[row][column] and marked[row][column]:
+                    text = "★"
+                else:
+                    continue
+                painter.setPen(palette.color(QPalette.ButtonText))
+                painter.drawText(tileRect, Qt.AlignCenter, text)
+                painter.setPen(palette.color(QPalette.Mid))
+        del painter
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().scroll(dx, dy)
+
+    def resizeEvent(self, resizeEvent):
+        if self.size is None:
+            self.horizontalScrollBar().setRange(-self.infiniteExtent, self.infiniteExtent)
+            self.verticalScrollBar().setRange(-self.infiniteExtent, self.infiniteExtent)
+        else:
+            length = self.size * self.tileSize
+            self.horizontalScrollBar().setRange(0, max(length - self.viewport().width(), 0))
+            self.verticalScrollBar().setRange(0, max(length - self.viewport().height(), 0))
+        self.horizontalScrollBar().setPageStep(self.viewport().width())
+        self.verticalScrollBar().setPageStep(self.viewport().height())
+
+    def mousePressEvent(self, mouseEvent):
+        position = mouseEvent.pos() + self.offset()
+        row_column = position.y() // self.tileSize, position.x() // self.tileSize
+        if row_column not in self.mineSweeper:
+            return
+        tile = self.mineSweeper[row_column]
+        if mouseEvent.button() == Qt.RightButton:
+            tile.mark()
+        elif mouseEvent.button() == Qt.LeftButton and not tile.revealed:
+            self.reveal(tile)
 
     def reveal(self, tile):
         tile.reveal(self.mineSweeper)
@@ -175,10 +745,150 @@ class QMineSweeper(QWidget):
             self.mineSweeper.reset()
 
     def sizeHint(self):
-        return QSize(300, 300)
+        length = min(self.size or 20, 20) * self.tileSize
+        return QSize(length, length)
+
+
+class TestMineSweeper(unittest.TestCase):
+    def testCounts(self):
+        mineSweeper = MineSweeper(50, 0.2)
+        for tile in mineSweeper:
+            bombs = sum(neighbor.explosive for neighbor in tile.neighbors(mineSweeper))
+            self.assertEqual(tile.bombs, bombs)
+        self.assertEqual(len(mineSweeper.field), 50 * 50)
+
+    def testLazyTiles(self):
+        mineSweeper = MineSweeper(1000, 0.1)
+        self.assertEqual(len(mineSweeper.field), 0)
+        tile = mineSweeper[500, 500]
+        tile.mark()
+        self.assertTrue(mineSweeper.marked[500, 500])
+        self.assertIs(mineSweeper[500, 500], tile)
+        self.assertNotIn((1000, 0), mineSweeper)
+        mineSweeper.reset()
+        self.assertFalse(tile.marked)
+        self.assertEqual(len(mineSweeper.field), 1)
+
+    def testScore(self):
+        mineSweeper = MineSweeper(30, 0.1)
+        for tile in mineSweeper:
+            if not tile.explosive:
+                tile.reveal(mineSweeper)
+                self.assertEqual(mineSweeper.hidden, np.count_nonzero(~mineSweeper.mines & ~mineSweeper.revealed))
+        self.assertEqual(mineSweeper.score(), +1)
+        mineSweeper.reveal()
+        self.assertEqual(mineSweeper.score(), -1)
+        mineSweeper.reset()
+        self.assertEqual(mineSweeper.score(), None)
+
+    def testFirstClick(self):
+        for noGuess in [False, True]:
+            mineSweeper = MineSweeper(16, 0.2, noGuess)
+            mineSweeper[8, 8].reveal(mineSweeper)
+            self.assertEqual(mineSweeper.counts[8, 8], 0)
+            self.assertEqual(mineSweeper.score(), None)
+            if noGuess:
+                self.assertTrue(MineSolver(mineSweeper).solve(8, 8))
+
+    def testSolverBenchmarkGivesUp(self):
+        # Accepting every board stands in for generation running out of attempts, dense boards need guesses.
+        np.random.seed(0)
+        with mock.patch.object(MineSolver, "solve", return_value=True), mock.patch("builtins.print"):
+            unsolved = MineSolver.benchmark(size=10, explosiveness=0.3, boards=5)
+        self.assertGreater(unsolved, 0)
+
+    def testSolverProbabilities(self):
+        import itertools
+        generator = np.random.default_rng(0)
+        for trial in range(20):
+            np.random.seed(trial)
+            mineSweeper = MineSweeper(4, 0.25)
+            for row, column in np.argwhere(~mineSweeper.mines).tolist()[:generator.integers(1, 4)]:
+                mineSweeper.flood(row, column)
+            solver = MineSolver(mineSweeper)
+            probabilities, outsideProbability = solver.probabilities()
+            unknown = [tuple(cell) for cell in np.argwhere(~mineSweeper.revealed).tolist()]
+            solutions = []
+            for mines in itertools.combinations(unknown, solver.total):
+                board = np.zeros(shape=mineSweeper.mines.shape, dtype=bool)
+                board[tuple(np.array(mines).T)] = True
+                if np.all(MineSweeper.neighborhood(board)[mineSweeper.revealed] ==
+                          mineSweeper.counts[mineSweeper.revealed]):
+                    solutions.append(set(mines))
+            for cell in unknown:
+                expected = fractions.Fraction(sum(cell in mines for mines in solutions), len(solutions))
+                self.assertEqual(probabilities.get(cell, outsideProbability), expected)
+
+    def testInfinite(self):
+        world = InfiniteMineSweeper(seed=5, chunkSize=16, capacity=8)
+        far = [(row, column) for row in range(-1000, 1000, 100) for column in range(-1000, 1000, 100)]
+        mines = [bool(world.mines[cell]) for cell in far]
+        counts = [int(world.counts[cell]) for cell in far]
+        self.assertLessEqual(len(world.chunks), 8)
+        self.assertEqual(mines, [bool(world.mines[cell]) for cell in far])
+        self.assertEqual(counts, [int(world.counts[cell]) for cell in far])
+        for row, column in far[:20]:
+            board = np.array([[world.mines[row + diffRow, column + diffCol] for diffCol in (-1, 0, 1)]
+                              for diffRow in (-1, 0, 1)])
+            self.assertEqual(world.counts[row, column], board.sum() - board[1, 1])
+
+        world[3, -3].reveal(world)
+        self.assertEqual(world.counts[3, -3], 0)
+        self.assertEqual(world.score(), None)
+        touched = [key for key, chunk in world.chunks.items() if chunk.touched]
+        world.window(5000, 5000, 5020, 5040)
+        for cell in far:
+            world.mines[cell]
+        self.assertTrue(all(key in world.chunks for key in touched))
+        self.assertTrue(world.revealed[3, -3])
+
+        world = InfiniteMineSweeper(seed=5, chunkSize=16)
+        world[40, -40].mark()
+        world[0, 0].reveal(world)
+        self.assertTrue(world[40, -40].marked)
+        self.assertEqual(sum(chunk.marked.sum() for chunk in world.chunks.values()), 1)
+
+        world = InfiniteMineSweeper(explosiveness=0.0, seed=1, chunkSize=4, capacity=4)
+        for chunk in range(4):
+            world.marked[chunk * 40, 0] = True
+        world.marked[100, 100] = True
+        self.assertTrue(world.marked[100, 100])
+        changed = world.flood(20, 20, limit=20000)
+        self.assertEqual(len(set(changed)), len(changed))
+        self.assertTrue(all(world.revealed[row, column] for row in range(12, 28) for column in range(12, 28)))
+
+    def testFlood(self):
+        mineSweeper = MineSweeper(400, 0.0)
+        mineSweeper.mines[200, :] = True
+        mineSweeper.count()
+        mineSweeper.marked[0, 399] = True
+        changed = []
+        mineSweeper.delegate = mock.Mock(updateEvent=changed.append)
+        mineSweeper[0, 0].reveal(mineSweeper)
+        self.assertEqual(len(changed), 1)
+        self.assertEqual(len(changed[0]), 200 * 400 - 1)
+        self.assertEqual(mineSweeper.score(), None)
+        self.assertFalse(mineSweeper.revealed[0, 399])
+        self.assertFalse(mineSweeper.revealed[201:].any())
 
 
 if __name__ == "__main__":
-    application = QApplication(sys.argv)
-    qMineSweeper = QMineSweeper(10)
+    parser = argparse.ArgumentParser(description="Minesweeper")
+    parser.add_argument("--size", type=int, default=10, help="number of tiles per board side")
+    parser.add_argument("--infinite", action="store_true", help="play on an endless lazily generated board")
+    parser.add_argument("--no-guess", action="store_true", help="only deal boards that can be solved without guessing")
+    parser.add_argument("--benchmark", action="store_true", help="measure click latency across board sizes")
+    parser.add_argument("--solver", action="store_true", help="measure no-guess generation and solver throughput")
+    arguments, qtArguments = parser.parse_known_args()
+    if arguments.infinite and arguments.no_guess:
+        parser.error("--no-guess is not supported on an --infinite board")
+    if arguments.benchmark:
+        MineSweeper.benchmark()
+        sys.exit(0)
+    if arguments.solver:
+        MineSolver.benchmark()
+        sys.exit(0)
+
+    application = QApplication(sys.argv[:1] + qtArguments)
+    qMineSweeper = QMineSweeper(None if arguments.infinite else arguments.size, arguments.no_guess)
     sys.exit(application.exec_())
@@ -1,307 +1,78 @@
-from PyQt5.QtCore import Qt, QTimer, QSize, QPointF, QRectF, QPropertyAnimation, QEasingCurve, \
+from PyQt5.QtCore import Qt, QSize, QPointF, QRectF, QPropertyAnimation, QEasingCurve, \
                          QSequentialAnimationGroup, QAbstractAnimation
 from PyQt5.QtWidgets import QApplication, QWidget, QFrame, QMessageBox, QGraphicsScene, \
                             QGraphicsView, QGraphicsObject, QGridLayout
 from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QTransform
-import random
+from tetrisengine import Tetris, TetrisState, TetrisBot
+import argparse
 import sys
 
 
-class Tetris:
-    class Tetritile:
-        def __init__(self, tetris, tetrimino, row, column, rotation):
-            self.tetris = tetris
-            self.delegate = None
-            self.tetrimino = tetrimino
-            self.rotation = rotation
-            self.row, self.column = row, column
-            if self.tetris[self.row, self.column] is None:
-                self.tetris[self.row, self.column] = self
-            else:
-                raise IndexError("Game Over")
-
-        def move(self, tetrimino, row, column, rotation):
-            try:
-                destination = self.tetris[row, column]
-            except KeyError:
-                return False
-            if destination in tetrimino or destination is None:
-                if self.tetris[self.row, self.column] == self:
-                    self.tetris[self.row, self.column] = None
-                self.row, self.column = row, column
-                self.rotation = rotation
-                self.tetris[self.row, self.column] = self
-                return True
-            else:
-                return False
-
-        def collapse(self):
-            if self.tetris[self.row, self.column] == self:
-                self.tetris[self.row, self.column] = None
-            self.collapsed()
-
-        def shift(self, delta):
-            if self.tetris[self.row, self.column] == self:
-                self.tetris[self.row, self.column] = None
-            self.row, self.column = self.row + delta, self.column
-            self.tetris[self.row, self.column] = self
-            self.shifted()
-
-        def moved(self, notify=True):
-            if notify is True:
-                self.delegate.moveEvent(self)
-
-        def dropped(self):
-            self.delegate.dropEvent(self)
-
-        def collapsed(self):
-            self.delegate.collapseEvent(self)
-
-        def shifted(self):
-            self.delegate.shiftEvent(self)
-
-    class Tetrimino:
-        shape = []
-        center = (0, 0)
-
-        def __init__(self, tetris, row, column):
-            self.row, self.column = row, column
-            self.rotation = 0
-
-            self.tetritiles = {}
-            for row, line in enumerate(self.shape):
-                for column, symbol in filter(lambda tpl: tpl[1] == "☒", enumerate(line)):
-                    local = row - self.center[0], column - self.center[1]
-                    tetritile = Tetris.Tetritile(tetris, self, self.row + local[0], self.column + local[1], self.rotation)
-                    self.tetritiles[tetritile] = local
-
-        def __contains__(self, item):
-            return item in self.tetritiles.keys()
-
-        def __iter__(self):
-            return self.tetritiles.keys().__iter__()
-
-        def moveLeft(self):
-            return self.move(self.row, self.column - 1, self.rotation)
-
-        def moveRight(self):
-            return self.move(self.row, self.column + 1, self.rotation)
-
-        def moveUp(self):
-            return self.move(self.row - 1, self.column, self.rotation)
-
-        def moveDown(self):
-            return self.move(self.row + 1, self.column, self.rotation)
-
-        def rotateLeft(self):
-            return self.move(self.row, self.column, self.rotation - 90)
-
-        def rotateRight(self):
-            return self.move(self.row, self.column, self.rotation + 90)
-
-        def drop(self):
-            while self.move(self.row + 1, self.column, self.rotation, False) is True:
-                pass
-            for tetritile in self:
-                tetritile.dropped()
-            return False
-
-        def move(self, row, column, rotation, notify=True):
-            for tetritile, local in self.tetritiles.items():
-                rotated = self.rotate(rotation, local)
-                if tetritile.move(self, row + rotated[0], column + rotated[1], rotation) is False:
-                    break
-            else:
-                for tetritile in self:
-                    tetritile.moved()
-                self.row, self.column = row, column
-                self.rotation = rotation
-                return True
-            for tetritile, local in self.tetritiles.items():
-                rotated = self.rotate(self.rotation, local)
-                tetritile.move(self, self.row + rotated[0], self.column + rotated[1], self.rotation)
-            return False
-
-        def rotate(self, rotation, row_column):
-            from math import sin, cos, radians
-            alpha = radians(rotation)
-            row    = cos(alpha) * row_column[0] - sin(alpha) * row_column[1]
-            columm = sin(alpha) * row_column[0] + cos(alpha) * row_column[1]
-            return round(row), round(columm)
-
-
-    class I(Tetrimino):
-        shape = ["☒☒☒☒"]
-        center = (0, 1)
-
-    class J(Tetrimino):
-        shape = ["☒☒☒",
-                 "☐☐☒"]
-        center = (0, 1)
-
-    class L(Tetrimino):
-        shape = ["☒☒☒",
-                 "☒☐☐"]
-        center = (0, 1)
-
-    class O(Tetrimino):
-        shape = ["☒☒",
-                 "☒☒"]
-        center = (0, 0)
-
-    class S(Tetrimino):
-        shape = ["☐☒☒",
-                 "☒☒☐"]
-        center = (0, 1)
-
-    class T(Tetrimino):
-        shape = ["☒☒☒",
-                 "☐☒☐"]
-        center = (0, 1)
-
-    class Z(Tetrimino):
-        shape = ["☒☒☐",
-                 "☐☒☒"]
-        center = (0, 1)
-
-    def __init__(self):
-        self.rows, self.columns = (20, 10)
-        self.spawnRow, self.spawnColumn = (0, 4)
-        self.delegate = None
-        self.score = 0
-
-        self.timer = QTimer()
-        self.timer.setInterval(350)
-        self.timer.timeout.connect(self.moveDown)
-        self.timer.stop()
-
-        self.tiles = {}
-        for row in range(self.rows):
-            for column in range(self.columns):
-                self[row, column] = None
-
-    def __getitem__(self, row_column):
-        return self.tiles[row_column]
-
-    def __setitem__(self, row_column, tetritile):
-        self.tiles[row_column] = tetritile
-
-    def __iter__(self):
-        return self.tiles.values().__iter__()
-
-    def __str__(self):
-        string = ""
-        for row in range(self.rows):
-            for column in range(self.columns):
-                string += "☒" if self[row, column] is not None else "☐"
-            string +="\n"
-        return string
-
-    def spawn(self):
-        randomTetrimino = random.choice([Tetris.I, Tetris.J, Tetris.L, Tetris.O, Tetris.S, Tetris.T, Tetris.Z])
-        try:
-            self.falling = randomTetrimino(self, self.spawnRow, self.spawnColumn)
-            self.delegate.appearEvent(self.falling)
-            self.timer.start()
-        except IndexError:
-            self.delegate.gameOverEvent(self.score)
-
-    def moveLeft(self):
-        if self.falling.moveLeft() is False:
-            self.check()
-
-    def moveRight(self):
-        if self.falling.moveRight() is False:
-            self.check()
-
-    def moveDown(self):
-        if self.falling.moveDown() is False:
-            self.timer.stop()
-            self.check()
-            self.spawn()
-
-    def rotate(self):
-        if self.falling.rotateRight() is True:
-            self.check()
-
-    def drop(self):
-        self.falling.drop()
-        self.timer.stop()
-        self.check()
-        self.spawn()
-
-    def check(self):
-        countColumns = [0] * self.rows
-        for row, column in self.tiles.keys():
-            if self[row, column] is not None:
-                countColumns[row] += 1
-        collapsedRows = []
-        for row, count in enumerate(countColumns):
-            if count == self.columns:
-                collapsedRows.append(row)
-
-        if len(collapsedRows) > 0:
-            self.collapse(collapsedRows)
-            self.shift(collapsedRows)
-            self.score += len(collapsedRows)
-            self.delegate.scoreEvent(self.score)
-
-    def collapse(self, collapsedRows):
-        for collapseRow in reversed(sorted(collapsedRows)):
-            for column in range(self.columns):
-                self[collapseRow, column].collapse()
-
-    def shift(self, collapsedRows):
-        for collapseRow in reversed(range(min(collapsedRows))):
-            for column in range(self.columns):
-                if self[collapseRow, column] is not None:
-                    self[collapseRow, column].shift(len(collapsedRows))
-
-    def restart(self):
-        self.timer.stop()
-        for row, column in self.tiles.keys():
-            if self[row, column] is not None:
-                self.delegate.disappearEvent(self[row, column])
-                self[row, column] = None
-        self.score = 0
-        self.delegate.scoreEvent(self.score)
-        self.spawn()
-
-
 class QTetris(QWidget):
+    poolSize = 200
+
     class QTetritile(QGraphicsObject):
         colorMap = {Tetris.I: QColor("#53bbf4"), Tetris.J: QColor("#e25fb8"), Tetris.L: QColor("#ffac00"),
                     Tetris.O: QColor("#ecff2e"), Tetris.S: QColor("#97eb00"), Tetris.T: QColor("#ff85cb"),
                     Tetris.Z: QColor("#ff5a48")}
-        def __init__(self, tetris, tetritile):
+        def __init__(self, tetris):
             super(QTetris.QTetritile, self).__init__()
-            tetritile.delegate = self
-            self.color = self.colorMap[type(tetritile.tetrimino)]
             self.tetris = tetris
+            self.tetritile = None
+            self.color = None
+            self.translationAnimation = QPropertyAnimation(self, b"pos")
+            self.rotationAnimation = QPropertyAnimation(self, b"rotation")
             self.moveAnimation = QSequentialAnimationGroup()
+            self.moveAnimation.addAnimation(self.translationAnimation)
+            self.moveAnimation.addAnimation(self.rotationAnimation)
             self.dropAnimation = QPropertyAnimation(self, b"pos")
             self.collapseAnimation = QPropertyAnimation(self, b"pos")
             self.shiftAnimation = QPropertyAnimation(self, b"pos")
-            self.collapseAnimation.finished.connect(lambda tetritile=tetritile: self.tetris.disappearEvent(tetritile))
+            self.collapseDelay = QSequentialAnimationGroup()
+            self.collapseDelay.addPause(0)
+            self.collapseDelay.addAnimation(self.collapseAnimation)
+            self.collapseDelay.finished.connect(lambda: self.tetris.disappearEvent(self.tetritile))
+            self.shiftDelay = QSequentialAnimationGroup()
+            self.shiftDelay.addPause(0)
+            self.shiftDelay.addAnimation(self.shiftAnimation)
+            self.animations = [self.moveAnimation, self.dropAnimation, self.collapseDelay, self.shiftDelay]
+            self.hide()
             self.tetris.scene.addItem(self)
             self.setPos(QPointF(0, 4))
+
+        def attach(self, tetritile):
+            tetritile.delegate = self
+            self.tetritile = tetritile
+            self.color = self.colorMap[type(tetritile.tetrimino)]
+            self.setPos(QPointF(0, 4))
+            self.setRotation(0)
+            self.show()
             self.moveEvent(tetritile)
 
+        def detach(self):
+            for animation in self.animations:
+                animation.stop()
+            self.tetritile = None
+            self.hide()
+            self.setPos(QPointF(0, 4))
+
+        def finish(self):
+            for animation in self.animations:
+                if animation.state() != QAbstractAnimation.Stopped:
+                    animation.setCurrentTime(animation.totalDuration())
+
         def moveEvent(self, tetritile):
-            translation = QPropertyAnimation(self, b"pos")
+            self.moveAnimation.stop()
             start, end = self.pos(), QPointF(tetritile.row, tetritile.column)
             curve, speed, delay = QEasingCurve.OutBack, 1 / 50, -1
-            self.animate(translation, start, end, curve, speed, delay)
+            self.animate(self.translationAnimation, start, end, curve, speed, delay)
 
-            rotation = QPropertyAnimation(self, b"rotation")
-            start, end = self.rotation(), tetritile.rotation
+            start = self.rotation()
+            end = start + (tetritile.rotation - start + 180) % 360 - 180
             curve, speed, delay = QEasingCurve.OutBack, 1, -1
-            self.animate(rotation, start, end, curve, speed, delay)
-            rotation.setDuration(translation.duration())
+            self.animate(self.rotationAnimation, start, end, curve, speed, delay)
+            self.rotationAnimation.setDuration(self.translationAnimation.duration())
 
-            self.moveAnimation.clear()
-            self.moveAnimation.addAnimation(translation)
-            self.moveAnimation.addAnimation(rotation)
             self.moveAnimation.start()
 
         def dropEvent(self, tetritile):
@@ -343,13 +114,16 @@ class QTetris(QWidget):
             animation.setEndValue(end)
             animation.setEasingCurve(curve)
             try:
-                animation.setDuration((end - start).manhattanLength() / speed)
+                animation.setDuration(int((end - start).manhattanLength() / speed))
             except AttributeError:
-                animation.setDuration(abs(end - start) / speed)
+                animation.setDuration(int(abs(end - start) / speed))
             if delay == 0:
                 animation.start()
             if delay > 0:
-                QTimer.singleShot(delay, animation.start)
+                delayAnimation = animation.group()
+                delayAnimation.stop()
+                delayAnimation.animationAt(0).setDuration(delay)
+                delayAnimation.start()
 
         def boundingRect(self):
             topLeft = QPointF(0, 0)
@@ -424,9 +198,9 @@ class QTetris(QWidget):
             self.setMouseTracking(True)
             self.setScene(scene)
 
-    def __init__(self):
+    def __init__(self, seed=None, bag=False):
         super(QTetris, self).__init__()
-        self.tetris = Tetris()
+        self.tetris = Tetris(seed=seed, bag=bag)
         self.tetris.delegate = self
         self.initUI()
         self.tetris.spawn()
@@ -441,17 +215,22 @@ class QTetris(QWidget):
         self.scene = QTetris.QTetriscene(self.tetris)
         self.view = QTetris.QTetriview(self.scene)
         self.layout().addWidget(self.view)
+        self.pool = [QTetris.QTetritile(self) for _ in range(self.poolSize)]
         self.scoreEvent(0)
 
     def appearEvent(self, tetrimino):
         for tetritile in tetrimino:
-            QTetris.QTetritile(self, tetritile)
+            qTetritile = self.pool.pop() if len(self.pool) > 0 else QTetris.QTetritile(self)
+            qTetritile.attach(tetritile)
 
     def scoreEvent(self, score):
         self.setWindowTitle(self.tr("Tetris - {score}").format(score=score))
 
     def disappearEvent(self, tetritile):
-        self.scene.removeItem(tetritile.delegate)
+        qTetritile = tetritile.delegate
+        if qTetritile is not None and qTetritile.tetritile is tetritile:
+            qTetritile.detach()
+            self.pool.append(qTetritile)
 
     def gameOverEvent(self, score):
         QMessageBox.critical(self, self.tr("Game Over!"), self.tr("You toppped out."), QMessageBox.Ok)
@@ -465,8 +244,54 @@ class QTetris(QWidget):
     def sizeHint(self):
         return QSize(self.tetris.columns * 22, self.tetris.rows * 22)
 
+    def benchmark(self, pieces, report=1000):
+        import time
+        import tracemalloc
+        bot, state = TetrisBot(), TetrisState(self.tetris.rows, self.tetris.columns)
+        self.gameOverEvent = lambda score: self.tetris.restart()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for piece in range(1, pieces + 1):
+            state.board = [sum(1 << column for column in range(self.tetris.columns)
+                               if self.tetris[row, column] is not None) for row in range(self.tetris.rows)]
+            state.tetrimino = type(self.tetris.falling)
+            placement = bot.play(state)
+            if placement is not None:
+                self.tetris.falling.move(self.tetris.falling.row, placement[1], placement[0])
+            self.tetris.drop()
+            QApplication.processEvents()
+            for item in self.scene.items():
+                if isinstance(item, QTetris.QTetritile):
+                    item.finish()
+            if piece % report == 0:
+                current, peak = tracemalloc.get_traced_memory()
+                print("{piece} pieces in {elapsed:.1f}s: {items} scene items, {pool} pooled, "
+                      "{current:.0f} KiB traced, {peak:.0f} KiB peak".format(
+                       piece=piece, elapsed=time.perf_counter() - start, items=len(self.scene.items()),
+                       pool=len(self.pool), current=current / 1024, peak=peak / 1024))
+        tracemalloc.stop()
+
 
 if __name__ == "__main__":
-    application = QApplication(sys.argv)
-    qTetris = QTetris()
+    def seed(text):
+        # Replay files store the seed as an unsigned 32 bit integer.
+        if not 0 <= int(text) < 2 ** 32:
+            raise argparse.ArgumentTypeError("seed must be between 0 and 2**32 - 1")
+        return int(text)
+
+    parser = argparse.ArgumentParser(description="Tetris")
+    parser.add_argument("--seed", type=seed, default=None, help="seed of the game")
+    parser.add_argument("--bag", action="store_true", help="deal tetriminos from shuffled bags of all seven")
+    parser.add_argument("--record", metavar="PATH", help="record the inputs of the game into a replay file")
+    parser.add_argument("--pool", type=int, default=0, help="benchmark tile pooling over that many bot pieces")
+    arguments, qtArguments = parser.parse_known_args()
+
+    application = QApplication(sys.argv[:1] + qtArguments)
+    qTetris = QTetris(arguments.seed, arguments.bag)
+    if arguments.record is not None:
+        qTetris.tetris.recorder = Tetris.Recorder(qTetris.tetris, arguments.record)
+        application.aboutToQuit.connect(qTetris.tetris.recorder.close)
+    if arguments.pool > 0:
+        qTetris.benchmark(arguments.pool)
+        sys.exit(0)
     sys.exit(application.exec_())
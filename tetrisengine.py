@@ -0,0 +1,758 @@
+from unittest import mock
+import struct
+import unittest
+import argparse
+import random
+import sys
+
+
+class Tetris:
+    class Tetritile:
+        def __init__(self, tetris, tetrimino, row, column, rotation):
+            self.tetris = tetris
+            self.delegate = None
+            self.tetrimino = tetrimino
+            self.rotation = rotation
+            self.row, self.column = row, column
+            if self.tetris[self.row, self.column] is None:
+                self.tetris[self.row, self.column] = self
+            else:
+                raise IndexError("Game Over")
+
+        def move(self, tetrimino, row, column, rotation):
+            if self.tetris[self.row, self.column] == self:
+                self.tetris[self.row, self.column] = None
+            self.row, self.column = row, column
+            self.rotation = rotation
+            self.tetris[self.row, self.column] = self
+
+        def collapse(self):
+            if self.tetris[self.row, self.column] == self:
+                self.tetris[self.row, self.column] = None
+            self.collapsed()
+
+        def shift(self, delta):
+            if self.tetris[self.row, self.column] == self:
+                self.tetris[self.row, self.column] = None
+            self.row, self.column = self.row + delta, self.column
+            self.tetris[self.row, self.column] = self
+            self.shifted()
+
+        def moved(self, notify=True):
+            if self.delegate is not None and notify is True:
+                self.delegate.moveEvent(self)
+
+        def dropped(self):
+            if self.delegate is not None:
+                self.delegate.dropEvent(self)
+
+        def collapsed(self):
+            if self.delegate is not None:
+                self.delegate.collapseEvent(self)
+
+        def shifted(self):
+            if self.delegate is not None:
+                self.delegate.shiftEvent(self)
+
+    class Tetrimino:
+        shape = []
+        center = (0, 0)
+        kicks = {("0", "R"): [(0, 0), (-1, 0), (-1, +1), (0, -2), (-1, -2)],
+                 ("R", "0"): [(0, 0), (+1, 0), (+1, -1), (0, +2), (+1, +2)],
+                 ("R", "2"): [(0, 0), (+1, 0), (+1, -1), (0, +2), (+1, +2)],
+                 ("2", "R"): [(0, 0), (-1, 0), (-1, +1), (0, -2), (-1, -2)],
+                 ("2", "L"): [(0, 0), (+1, 0), (+1, +1), (0, -2), (+1, -2)],
+                 ("L", "2"): [(0, 0), (-1, 0), (-1, -1), (0, +2), (-1, +2)],
+                 ("L", "0"): [(0, 0), (-1, 0), (-1, -1), (0, +2), (-1, +2)],
+                 ("0", "L"): [(0, 0), (+1, 0), (+1, +1), (0, -2), (+1, -2)]}
+        rotations = ()
+        wallKicks = {}
+
+        def __init_subclass__(cls, **kwargs):
+            super().__init_subclass__(**kwargs)
+            local = [(row - cls.center[0], column - cls.center[1])
+                     for row, line in enumerate(cls.shape)
+                     for column, symbol in enumerate(line) if symbol == "☒"]
+            rotations = []
+            for _ in range(4):
+                rotations.append(tuple(local))
+                local = [(-column, row) for row, column in local]
+            cls.rotations = tuple(rotations)
+            # SRS tables are written as (x, y) offsets with y pointing up and keyed by SRS rotation states, where
+            # the counter-clockwise rotateRight of this game visits the states in 0 -> L -> 2 -> R order.
+            states = "0L2R"
+            cls.wallKicks = {(states.index(start), states.index(end)): tuple((-y, x) for x, y in offsets)
+                             for (start, end), offsets in cls.kicks.items()}
+
+        def __init__(self, tetris, row, column):
+            self.tetris = tetris
+            self.row, self.column = row, column
+            self.rotation = 0
+
+            self.tetritiles = []
+            for local in self.rotations[self.rotation]:
+                tetritile = Tetris.Tetritile(tetris, self, self.row + local[0], self.column + local[1], self.rotation)
+                self.tetritiles.append(tetritile)
+
+        def __contains__(self, item):
+            return item in self.tetritiles
+
+        def __iter__(self):
+            return self.tetritiles.__iter__()
+
+        def moveLeft(self):
+            return self.move(self.row, self.column - 1, self.rotation)
+
+        def moveRight(self):
+            return self.move(self.row, self.column + 1, self.rotation)
+
+        def moveUp(self):
+            return self.move(self.row - 1, self.column, self.rotation)
+
+        def moveDown(self):
+            return self.move(self.row + 1, self.column, self.rotation)
+
+        def rotateLeft(self):
+            return self.turn((self.rotation - 1) % 4)
+
+        def rotateRight(self):
+            return self.turn((self.rotation + 1) % 4)
+
+        def turn(self, rotation):
+            kicks = self.wallKicks.get((self.rotation, rotation), ()) if self.tetris.wallKicks else ()
+            for diffRow, diffColumn in kicks or ((0, 0),):
+                if self.move(self.row + diffRow, self.column + diffColumn, rotation) is True:
+                    return True
+            return False
+
+        def drop(self):
+            while self.move(self.row + 1, self.column, self.rotation, False) is True:
+                pass
+            for tetritile in self:
+                tetritile.dropped()
+            return False
+
+        def fits(self, row, column, rotation):
+            tiles = self.tetris.tiles
+            for localRow, localColumn in self.rotations[rotation]:
+                destination = tiles.get((row + localRow, column + localColumn), False)
+                if destination is not None and destination not in self.tetritiles:
+                    return False
+            return True
+
+        def move(self, row, column, rotation, notify=True):
+            if not self.fits(row, column, rotation):
+                return False
+            for tetritile, local in zip(self.tetritiles, self.rotations[rotation]):
+                tetritile.move(self, row + local[0], column + local[1], 90 * rotation)
+            for tetritile in self:
+                tetritile.moved(notify)
+            self.row, self.column = row, column
+            self.rotation = rotation
+            return True
+
+    class I(Tetrimino):
+        shape = ["☒☒☒☒"]
+        center = (0, 1)
+        kicks = {("0", "R"): [(0, 0), (-2, 0), (+1, 0), (-2, -1), (+1, +2)],
+                 ("R", "0"): [(0, 0), (+2, 0), (-1, 0), (+2, +1), (-1, -2)],
+                 ("R", "2"): [(0, 0), (-1, 0), (+2, 0), (-1, +2), (+2, -1)],
+                 ("2", "R"): [(0, 0), (+1, 0), (-2, 0), (+1, -2), (-2, +1)],
+                 ("2", "L"): [(0, 0), (+2, 0), (-1, 0), (+2, +1), (-1, -2)],
+                 ("L", "2"): [(0, 0), (-2, 0), (+1, 0), (-2, -1), (+1, +2)],
+                 ("L", "0"): [(0, 0), (+1, 0), (-2, 0), (+1, -2), (-2, +1)],
+                 ("0", "L"): [(0, 0), (-1, 0), (+2, 0), (-1, +2), (+2, -1)]}
+
+    class J(Tetrimino):
+        shape = ["☒☒☒",
+                 "☐☐☒"]
+        center = (0, 1)
+
+    class L(Tetrimino):
+        shape = ["☒☒☒",
+                 "☒☐☐"]
+        center = (0, 1)
+
+    class O(Tetrimino):
+        shape = ["☒☒",
+                 "☒☒"]
+        center = (0, 0)
+        kicks = {}
+
+    class S(Tetrimino):
+        shape = ["☐☒☒",
+                 "☒☒☐"]
+        center = (0, 1)
+
+    class T(Tetrimino):
+        shape = ["☒☒☒",
+                 "☐☒☐"]
+        center = (0, 1)
+
+    class Z(Tetrimino):
+        shape = ["☒☒☐",
+                 "☐☒☒"]
+        center = (0, 1)
+
+    class Randomizer:
+        def __init__(self, seed=None, bag=False):
+            self.seed = seed if seed is not None else random.randrange(2 ** 32)
+            self.bag = bag
+            self.random = random.Random(self.seed)
+            self.queue = []
+
+        def __call__(self):
+            tetriminos = [Tetris.I, Tetris.J, Tetris.L, Tetris.O, Tetris.S, Tetris.T, Tetris.Z]
+            if self.bag is False:
+                return self.random.choice(tetriminos)
+            if len(self.queue) == 0:
+                self.queue = self.random.sample(tetriminos, len(tetriminos))
+            return self.queue.pop()
+
+        def copy(self):
+            randomizer = Tetris.Randomizer(self.seed, self.bag)
+            randomizer.random.setstate(self.random.getstate())
+            randomizer.queue = list(self.queue)
+            return randomizer
+
+    class Recorder:
+        # Little endian log of a header (magic, version, flags, seed, rows, columns) followed by one (milliseconds,
+        # action) record per input and a trailer record holding the final score and the board packed as bits.
+        actions = ["moveLeft", "moveRight", "moveDown", "rotate", "drop", "restart"]
+        header = struct.Struct("<4sBBIBB")
+        record = struct.Struct("<IB")
+        trailer = struct.Struct("<I")
+        magic, version, end = b"TTRS", 1, 255
+
+        def __init__(self, tetris, path):
+            import time
+            if not 0 <= tetris.randomizer.seed < 2 ** 32:
+                raise ValueError("Tetris replays record seeds between 0 and 2**32 - 1")
+            self.clock = time.monotonic
+            self.tetris = tetris
+            self.file = open(path, "wb")
+            self.start = self.clock()
+            flags = int(tetris.randomizer.bag) | int(tetris.wallKicks) << 1
+            self.file.write(self.header.pack(self.magic, self.version, flags, tetris.randomizer.seed,
+                                             tetris.rows, tetris.columns))
+
+        def __call__(self, action):
+            milliseconds = int(1000 * (self.clock() - self.start))
+            self.file.write(self.record.pack(milliseconds, self.actions.index(action)))
+
+        def close(self):
+            milliseconds = int(1000 * (self.clock() - self.start))
+            self.file.write(self.record.pack(milliseconds, self.end))
+            self.file.write(self.trailer.pack(self.tetris.score))
+            self.file.write(self.tetris.pack())
+            self.file.close()
+
+        @classmethod
+        def read(cls, path):
+            with open(path, "rb") as file:
+                data = file.read()
+            magic, version, flags, seed, rows, columns = cls.header.unpack_from(data)
+            if magic != cls.magic or version != cls.version:
+                raise ValueError("Not a Tetris replay")
+            events, offset = [], cls.header.size
+            while True:
+                milliseconds, action = cls.record.unpack_from(data, offset)
+                offset += cls.record.size
+                if action == cls.end:
+                    break
+                events.append((milliseconds, cls.actions[action]))
+            score, = cls.trailer.unpack_from(data, offset)
+            board = data[offset + cls.trailer.size:]
+            return {"bag": bool(flags & 1), "wallKicks": bool(flags & 2), "seed": seed, "rows": rows,
+                    "columns": columns, "events": events, "score": score, "board": board}
+
+    def __init__(self, wallKicks=False, seed=None, bag=False, realtime=True):
+        self.rows, self.columns = (20, 10)
+        self.spawnRow, self.spawnColumn = (0, 4)
+        self.wallKicks = wallKicks
+        self.randomizer = Tetris.Randomizer(seed, bag)
+        self.recorder = None
+        self.delegate = None
+        self.score = 0
+
+        self.timer = None
+        if realtime is True:
+            # Only games played in real time need Qt, headless replays, bots and environments run without it.
+            from PyQt5.QtCore import QTimer
+            self.timer = QTimer()
+            self.timer.setInterval(350)
+            self.timer.timeout.connect(self.moveDown)
+            self.timer.stop()
+
+        self.tiles = {}
+        for row in range(self.rows):
+            for column in range(self.columns):
+                self[row, column] = None
+
+    def __getitem__(self, row_column):
+        return self.tiles[row_column]
+
+    def __setitem__(self, row_column, tetritile):
+        self.tiles[row_column] = tetritile
+
+    def __iter__(self):
+        return self.tiles.values().__iter__()
+
+    def __str__(self):
+        string = ""
+        for row in range(self.rows):
+            for column in range(self.columns):
+                string += "☒" if self[row, column] is not None else "☐"
+            string +="\n"
+        return string
+
+    def pack(self):
+        bits = 0
+        for row in range(self.rows):
+            for column in range(self.columns):
+                if self[row, column] is not None:
+                    bits |= 1 << (row * self.columns + column)
+        return bits.to_bytes((self.rows * self.columns + 7) // 8, "little")
+
+    def record(self, action):
+        if self.recorder is not None:
+            self.recorder(action)
+
+    def start(self):
+        if self.timer is not None:
+            self.timer.start()
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+
+    def spawn(self):
+        randomTetrimino = self.randomizer()
+        try:
+            self.falling = randomTetrimino(self, self.spawnRow, self.spawnColumn)
+            if self.delegate is not None:
+                self.delegate.appearEvent(self.falling)
+            self.start()
+        except IndexError:
+            if self.delegate is not None:
+                self.delegate.gameOverEvent(self.score)
+
+    def moveLeft(self):
+        self.record("moveLeft")
+        if self.falling.moveLeft() is False:
+            self.check()
+
+    def moveRight(self):
+        self.record("moveRight")
+        if self.falling.moveRight() is False:
+            self.check()
+
+    def moveDown(self):
+        self.record("moveDown")
+        if self.falling.moveDown() is False:
+            self.stop()
+            self.check()
+            self.spawn()
+
+    def rotate(self):
+        self.record("rotate")
+        if self.falling.rotateRight() is True:
+            self.check()
+
+    def drop(self):
+        self.record("drop")
+        self.falling.drop()
+        self.stop()
+        self.check()
+        self.spawn()
+
+    def check(self):
+        countColumns = [0] * self.rows
+        for row, column in self.tiles.keys():
+            if self[row, column] is not None:
+                countColumns[row] += 1
+        collapsedRows = []
+        for row, count in enumerate(countColumns):
+            if count == self.columns:
+                collapsedRows.append(row)
+
+        if len(collapsedRows) > 0:
+            self.collapse(collapsedRows)
+            self.shift(collapsedRows)
+            self.score += len(collapsedRows)
+            if self.delegate is not None:
+                self.delegate.scoreEvent(self.score)
+
+    def collapse(self, collapsedRows):
+        for collapseRow in reversed(sorted(collapsedRows)):
+            for column in range(self.columns):
+                self[collapseRow, column].collapse()
+
+    def shift(self, collapsedRows):
+        for collapseRow in reversed(range(min(collapsedRows))):
+            for column in range(self.columns):
+                if self[collapseRow, column] is not None:
+                    self[collapseRow, column].shift(len(collapsedRows))
+
+    def restart(self):
+        self.record("restart")
+        self.stop()
+        for row, column in self.tiles.keys():
+            if self[row, column] is not None:
+                if self.delegate is not None:
+                    self.delegate.disappearEvent(self[row, column])
+                self[row, column] = None
+        self.score = 0
+        if self.delegate is not None:
+            self.delegate.scoreEvent(self.score)
+        self.spawn()
+
+    @classmethod
+    def replay(cls, path):
+        import time
+        log = Tetris.Recorder.read(path)
+        tetris = cls(log["wallKicks"], log["seed"], log["bag"], realtime=False)
+        start = time.perf_counter()
+        tetris.spawn()
+        for _, action in log["events"]:
+            getattr(tetris, action)()
+        elapsed = time.perf_counter() - start
+        return tetris, log, elapsed
+
+
+class TetrisState:
+    tetriminos = [Tetris.I, Tetris.J, Tetris.L, Tetris.O, Tetris.S, Tetris.T, Tetris.Z]
+    compiled = {}
+
+    def __init__(self, rows=20, columns=10, seed=None, bag=False):
+        self.rows, self.columns = rows, columns
+        self.board = [0] * self.rows
+        self.score = 0
+        self.pieces = 0
+        self.over = False
+        self.randomizer = Tetris.Randomizer(seed, bag)
+        self.tetrimino = self.spawn()
+
+    def __str__(self):
+        string = ""
+        for line in self.board:
+            for column in range(self.columns):
+                string += "☒" if line >> column & 1 else "☐"
+            string += "\n"
+        return string
+
+    def copy(self):
+        state = TetrisState.__new__(TetrisState)
+        state.__dict__.update(self.__dict__)
+        state.board = list(self.board)
+        state.randomizer = self.randomizer.copy()
+        return state
+
+    def spawn(self):
+        return self.randomizer()
+
+    @classmethod
+    def compile(cls, tetrimino, columns):
+        # Per distinct rotation: the pivot column range, the lowest cell of every covered column and the cells grouped
+        # into one bit mask per row, all relative to the pivot so that a placement is a handful of integer operations.
+        key = tetrimino, columns
+        if key not in cls.compiled:
+            placements, shapes = [], set()
+            for rotation, local in enumerate(tetrimino.rotations):
+                minRow = min(row for row, _ in local)
+                minColumn = min(column for _, column in local)
+                maxColumn = max(column for _, column in local)
+                shape = frozenset((row - minRow, column - minColumn) for row, column in local)
+                if shape in shapes:
+                    continue
+                shapes.add(shape)
+                bottoms, masks = {}, {}
+                for row, column in local:
+                    bottoms[column] = max(bottoms.get(column, row), row)
+                    masks[row] = masks.get(row, 0) | 1 << (column - minColumn)
+                placements.append((rotation, -minColumn, columns - 1 - maxColumn, minColumn,
+                                   tuple(bottoms.items()), tuple(masks.items())))
+            cls.compiled[key] = placements
+        return cls.compiled[key]
+
+    def tops(self):
+        tops, seen = [self.rows] * self.columns, 0
+        for row, line in enumerate(self.board):
+            fresh = line & ~seen
+            while fresh:
+                bit = fresh & -fresh
+                tops[bit.bit_length() - 1] = row
+                fresh ^= bit
+            seen |= line
+        return tops
+
+    def placements(self):
+        tops = self.tops()
+        for rotation, minPivot, maxPivot, minColumn, bottoms, masks in self.compile(self.tetrimino, self.columns):
+            for column in range(minPivot, maxPivot + 1):
+                row = min(tops[column + diffColumn] - bottom for diffColumn, bottom in bottoms) - 1
+                yield rotation, column, row
+
+    def drop(self, rotation, column, row=None):
+        # Returns the board after hard dropping the current tetrimino and the count of cleared lines, or None when
+        # the tetrimino tops out. The state itself is left untouched.
+        for placement in self.compile(self.tetrimino, self.columns):
+            if placement[0] == rotation:
+                _, minPivot, maxPivot, minColumn, bottoms, masks = placement
+                break
+        else:
+            raise ValueError(rotation)
+        if not minPivot <= column <= maxPivot:
+            raise ValueError(column)
+        if row is None:
+            tops = self.tops()
+            row = min(tops[column + diffColumn] - bottom for diffColumn, bottom in bottoms) - 1
+        board, full, lines = list(self.board), (1 << self.columns) - 1, 0
+        for diffRow, mask in masks:
+            if row + diffRow < 0:
+                return None
+            board[row + diffRow] |= mask << (column + minColumn)
+            lines += board[row + diffRow] == full
+        if lines > 0:
+            board = [0] * lines + [line for line in board if line != full]
+        return board, lines
+
+    def place(self, rotation, column, row=None):
+        result = self.drop(rotation, column, row)
+        self.pieces += 1
+        if result is None:
+            self.over = True
+            return None
+        self.board, lines = result
+        self.score += lines
+        self.tetrimino = self.spawn()
+        return lines
+
+
+class TetrisBot:
+    weights = {"height": -0.510066, "lines": +0.760666, "holes": -0.35663, "bumpiness": -0.184483}
+
+    def __init__(self, weights=None):
+        self.weights = dict(TetrisBot.weights, **(weights or {}))
+        self.evaluated = 0
+
+    def evaluate(self, board, lines, columns):
+        rows, seen, holes, heights = len(board), 0, 0, [0] * columns
+        for row, line in enumerate(board):
+            fresh = line & ~seen
+            while fresh:
+                bit = fresh & -fresh
+                heights[bit.bit_length() - 1] = rows - row
+                fresh ^= bit
+            seen |= line
+            holes += bin(seen & ~line).count("1")
+        bumpiness = sum(abs(left - right) for left, right in zip(heights, heights[1:]))
+        return self.weights["height"] * sum(heights) + self.weights["lines"] * lines + \
+               self.weights["holes"] * holes + self.weights["bumpiness"] * bumpiness
+
+    def play(self, state):
+        bestScore, bestPlacement = float("-inf"), None
+        for rotation, column, row in state.placements():
+            result = state.drop(rotation, column, row)
+            self.evaluated += 1
+            if result is None:
+                continue
+            score = self.evaluate(result[0], result[1], state.columns)
+            if score > bestScore:
+                bestScore, bestPlacement = score, (rotation, column)
+        return bestPlacement
+
+    def benchmark(self, games, pieces, seed=0):
+        import time
+        placed, lines = 0, 0
+        start = time.perf_counter()
+        for game in range(games):
+            state = TetrisState(seed=seed + game)
+            while not state.over and state.pieces < pieces:
+                placement = self.play(state)
+                if placement is None:
+                    break
+                state.place(*placement)
+            placed, lines = placed + state.pieces, lines + state.score
+        elapsed = time.perf_counter() - start
+        print("{games} games, {pieces} pieces in {elapsed:.2f}s".format(games=games, pieces=placed, elapsed=elapsed))
+        print("{rate:.0f} pieces/s, {placements:.0f} placements/min, {lines:.1f} lines/game".format(
+            rate=placed / elapsed, placements=60 * self.evaluated / elapsed, lines=lines / games))
+
+
+class BatchTetris:
+    tetriminos = TetrisState.tetriminos
+
+    def __init__(self, count, rows=20, columns=10, seed=None):
+        # NumPy is only imported by the batched environment, the game, the bot and the Qt interface run without it.
+        import numpy as np
+        self.count, self.rows, self.columns = count, rows, columns
+        self.actions = 4 * self.columns
+        self.random = np.random.default_rng(seed)
+        self.boards = np.zeros(shape=(count, rows, columns), dtype=np.uint8)
+        self.pieces = self.random.integers(len(self.tetriminos), size=count)
+        self.scores = np.zeros(shape=count, dtype=np.int64)
+        self.everyone = np.arange(count)
+
+        # Cell offsets and allowed pivot columns per (tetrimino, rotation), so that an action, which is
+        # rotation * columns + column, can be resolved for the whole batch with fancy indexing.
+        self.cells = np.zeros(shape=(len(self.tetriminos), 4, 4, 2), dtype=np.int64)
+        self.pivots = np.zeros(shape=(len(self.tetriminos), 4, 2), dtype=np.int64)
+        for piece, tetrimino in enumerate(self.tetriminos):
+            for rotation, local in enumerate(tetrimino.rotations):
+                self.cells[piece, rotation] = local
+                columns = [column for _, column in local]
+                self.pivots[piece, rotation] = -min(columns), self.columns - 1 - max(columns)
+
+    def reset(self, mask=None):
+        import numpy as np
+        if mask is None:
+            mask = np.ones(shape=self.count, dtype=bool)
+        self.boards[mask] = 0
+        self.scores[mask] = 0
+        self.pieces[mask] = self.random.integers(len(self.tetriminos), size=np.count_nonzero(mask))
+        return self.boards, self.pieces
+
+    def step(self, actions):
+        import numpy as np
+        rotations, columns = np.divmod(np.asarray(actions), self.columns)
+        pivots = self.pivots[self.pieces, rotations]
+        columns = np.clip(columns, pivots[:, 0], pivots[:, 1])
+        cells = self.cells[self.pieces, rotations]
+        cellRows, cellColumns = cells[:, :, 0], cells[:, :, 1] + columns[:, None]
+
+        filled = self.boards.any(axis=1)
+        tops = np.where(filled, self.boards.argmax(axis=1), self.rows)
+        landing = (np.take_along_axis(tops, cellColumns, axis=1) - cellRows).min(axis=1) - 1
+        cellRows = cellRows + landing[:, None]
+        dones = (cellRows < 0).any(axis=1)
+        alive = ~dones
+        self.boards[self.everyone[alive, None], cellRows[alive], cellColumns[alive]] = 1
+
+        full = self.boards.all(axis=2)
+        rewards = full.sum(axis=1)
+        cleared = np.flatnonzero(rewards)
+        if cleared.size > 0:
+            order = np.argsort(~full[cleared], axis=1, kind="stable")
+            boards = np.take_along_axis(self.boards[cleared], order[:, :, None], axis=1)
+            boards[np.arange(self.rows)[None, :] < rewards[cleared, None]] = 0
+            self.boards[cleared] = boards
+        self.scores += rewards
+
+        self.pieces = self.random.integers(len(self.tetriminos), size=self.count)
+        if dones.any():
+            self.reset(dones)
+        return (self.boards, self.pieces), rewards, dones
+
+    def benchmark(self, steps):
+        import time
+        start = time.perf_counter()
+        for _ in range(steps):
+            self.step(self.random.integers(self.actions, size=self.count))
+        elapsed = time.perf_counter() - start
+        print("{count} boards x {steps} steps in {elapsed:.2f}s, {rate:.0f} steps/s".format(
+            count=self.count, steps=steps, elapsed=elapsed, rate=self.count * steps / elapsed))
+
+
+class TestTetris(unittest.TestCase):
+    def testRotationTables(self):
+        from math import sin, cos, radians
+        for tetrimino in [Tetris.I, Tetris.J, Tetris.L, Tetris.O, Tetris.S, Tetris.T, Tetris.Z]:
+            for rotation in range(4):
+                alpha = radians(90 * rotation)
+                rotated = tuple((round(cos(alpha) * row - sin(alpha) * column),
+                                 round(sin(alpha) * row + cos(alpha) * column))
+                                for row, column in tetrimino.rotations[0])
+                self.assertEqual(rotated, tetrimino.rotations[rotation])
+
+    def testWallKicks(self):
+        for wallKicks, rotated in [(False, False), (True, True)]:
+            tetris = Tetris(wallKicks, realtime=False)
+            tetrimino = Tetris.I(tetris, 5, 4)
+            for tetritile in tetrimino:
+                tetritile.delegate = mock.Mock()
+            self.assertTrue(tetrimino.move(5, 0, 1))
+            self.assertEqual(tetrimino.rotateLeft(), rotated)
+            self.assertEqual(tetrimino.rotation, 0 if rotated else 1)
+            self.assertEqual(sum(tile is not None for tile in tetris), 4)
+
+    def testReplay(self):
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "replay.bin")
+            tetris = Tetris(seed=7, bag=True, realtime=False)
+            tetris.recorder = Tetris.Recorder(tetris, path)
+            tetris.spawn()
+            actions, generator = Tetris.Recorder.actions[:-1], random.Random(0)
+            for _ in range(2000):
+                getattr(tetris, generator.choice(actions))()
+            tetris.recorder.close()
+            replayed, log, _ = Tetris.replay(path)
+            self.assertEqual(len(log["events"]), 2000)
+            self.assertEqual((replayed.score, replayed.pack()), (log["score"], log["board"]))
+            self.assertEqual(str(replayed), str(tetris))
+            with self.assertRaises(ValueError):
+                Tetris.Recorder(Tetris(seed=-1, realtime=False), path)
+
+    def testBag(self):
+        randomizer = Tetris.Randomizer(seed=3, bag=True)
+        for _ in range(5):
+            self.assertEqual(len({randomizer() for _ in range(7)}), 7)
+
+    def testPlacements(self):
+        state = TetrisState(seed=0)
+        for tetrimino, count in [(Tetris.I, 17), (Tetris.O, 9), (Tetris.S, 17), (Tetris.T, 34)]:
+            state.tetrimino = tetrimino
+            self.assertEqual(len(list(state.placements())), count)
+
+    def testBot(self):
+        state = TetrisState(seed=0)
+        copy = state.copy()
+        bot = TetrisBot()
+        while not state.over and state.pieces < 200:
+            state.place(*bot.play(state))
+        self.assertFalse(state.over)
+        self.assertGreater(state.score, 50)
+        self.assertEqual(copy.board, [0] * copy.rows)
+        self.assertEqual(copy.spawn(), TetrisState(seed=0).copy().spawn())
+
+    def testBatchTetris(self):
+        batch = BatchTetris(3, seed=0)
+        batch.pieces[:] = TetrisState.tetriminos.index(Tetris.I)
+        batch.boards[:, -1, :] = 1
+        batch.boards[:, -1, 4:8] = 0
+        batch.boards[:, -2, 0] = 1
+        (boards, pieces), rewards, dones = batch.step([5, 0, 10 + 9])
+        self.assertEqual(boards.shape, (3, 20, 10))
+        self.assertEqual(rewards.tolist(), [1, 0, 0])
+        self.assertEqual(dones.tolist(), [False, False, False])
+        self.assertEqual(boards[0].sum(), 1)
+        self.assertEqual(boards[0, -1, 0], 1)
+        self.assertEqual(boards[1, -3, 0:4].tolist(), [1, 1, 1, 1])
+        self.assertEqual(boards[2, -5:-1, 9].tolist(), [1, 1, 1, 1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Tetris")
+    parser.add_argument("--bot", action="store_true", help="benchmark the placement-search bot")
+    parser.add_argument("--games", type=int, default=10, help="number of seeded bot games")
+    parser.add_argument("--pieces", type=int, default=1000, help="maximum number of pieces per bot game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first bot game or of the batch")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded game and check its outcome")
+    parser.add_argument("--batch", type=int, default=0, help="benchmark a batch of that many environment boards")
+    parser.add_argument("--steps", type=int, default=1000, help="number of batched environment steps")
+    arguments = parser.parse_args()
+    if arguments.bot:
+        TetrisBot().benchmark(arguments.games, arguments.pieces, arguments.seed)
+    if arguments.batch > 0:
+        BatchTetris(arguments.batch, seed=arguments.seed).benchmark(arguments.steps)
+    if arguments.replay is not None:
+        tetris, log, elapsed = Tetris.replay(arguments.replay)
+        matches = tetris.score == log["score"] and tetris.pack() == log["board"]
+        print(tetris)
+        print("{events} inputs of {duration:.1f}s replayed in {elapsed:.3f}s ({rate:.0f} inputs/s), score {score}, "
+              "{result}".format(events=len(log["events"]), duration=log["events"][-1][0] / 1000 if log["events"] else 0,
+                                elapsed=elapsed, rate=len(log["events"]) / elapsed, score=tetris.score,
+                                result="outcome matches" if matches else "outcome differs"))
+        sys.exit(0 if matches else 1)